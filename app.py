@@ -5,79 +5,272 @@ import pandas as pd
 
 from alpaca_trade_api.rest import REST
 from config import get_alpaca_credentials, BASE_URL
-from data.yahoo_data import get_historical_data, get_sp500_symbols
-from data.feature_engineering import compute_return_features
-from strategies.xboost_tree_eval import train_models, evaluate_models
+from data.yahoo_data import get_sp500_symbols
+from data.universe import UniverseStore
+from data.bulk_download import download_symbols
+from data.bar_cache import cached_download_kwargs
+from data.feature_engineering import compute_return_features, FEATURE_COLS
+from data.feature_store import FeatureStore
+from data.compact import compact_frame, plan_symbol_chunks, MEMORY_BUDGET_MB
+from strategies.xboost_tree_eval import train_models, evaluate_models, save_rankings, train_evaluate_horizons
+from strategies.pooled_model import train_pooled_model, evaluate_pooled_model
+from strategies.walk_forward import walk_forward
+from strategies.tuning import tune
+from strategies.out_of_core import train_pooled_out_of_core
+from strategies.tree_compiler import export_compiled
+from backtesting.simulator import build_price_matrix, ffill_matrix
+from backtesting.rolling import load_ranking_history, run_rolling_backtest
+from backtesting.sweep import run_sweep
 from trading.alpaca import allocate_portfolio, monitor_positions, check_account, close_all_positions
 
 # Global API object placeholder
 api = None
 
+FEATURE_STORE_DIR = "logs/feature_store"
+KEEP_SNAPSHOTS = 30  # daily feature snapshots kept by retrieve_data
+
 def cur_date():
     """
     Get today's date string
     """
     return datetime.now().strftime("%Y-%m-%d")
 
-def retrieve_data(start_date="2020-01-01", end_date="2025-01-01", interval="1d"):
+def retrieve_data(start_date="2020-01-01", end_date="2025-01-01", interval="1d", workers=8, batch_size=1,
+                  cache_dir="cache/bars", offline=False, keep_snapshots=KEEP_SNAPSHOTS, as_of=None):
     """
     Step 1: Download historical data and compute features
-    python app.py retrieve_data --start_date 2020-01-01 --end_date 2025-07-24 --interval 1d 
+    python app.py retrieve_data --start_date 2020-01-01 --end_date 2025-07-24 --interval 1d --workers 8 --batch_size 50
+    Bars are served from the on-disk cache in cache_dir; only missing ranges are downloaded.
+    python app.py retrieve_data --offline   (replay from cache only, no network)
+    Only the newest keep_snapshots feature snapshots are kept (0 keeps them all).
+    python app.py retrieve_data --as_of 2020-01-02   (the S&P 500 members on that day)
     """
     print("[INFO] Pulling Yahoo Finance data for S&P 500 symbols...")
-    symbols = get_sp500_symbols()
-    all_data = pd.DataFrame()
+    symbols = get_sp500_symbols(as_of=as_of, offline=offline)
+    cache_kwargs = cached_download_kwargs(cache_dir, offline=offline)
+    frames, _ = download_symbols(
+        symbols, start=start_date, end=end_date, interval=interval,
+        max_workers=workers, batch_size=batch_size, **cache_kwargs,
+    )
 
-    for symbol in symbols:
+    parts = []
+    for symbol, df in frames.items():
         try:
-            df = get_historical_data(symbol, start=start_date, end=end_date)
-            if isinstance(df.columns, pd.MultiIndex):
-                df = compute_return_features(df)
-                df["Symbol"] = symbol 
-                df.columns = df.columns.droplevel(1)
-            else:
-                df['Symbol'] = symbol
-
+            df = compute_return_features(df)
+            df["Symbol"] = symbol
             df.reset_index(inplace=True)
-            all_data = pd.concat([all_data, df], ignore_index=True)
-            print(f"[INFO] Pulled {symbol}")
+            parts.append(df)
         except Exception as e:
-            print(f"[WARNING] Failed to pull {symbol}: {e}")
+            print(f"[WARNING] Failed to compute features for {symbol}: {e}")
+    all_data = pd.concat(parts, ignore_index=True)
 
     all_data['Date'] = pd.to_datetime(all_data['Date'])
     all_data = all_data.sort_values(by='Date')
 
-    os.makedirs("logs/features", exist_ok=True)
     timestamp = cur_date()
-    file_path = f"logs/features/feature_df_{timestamp}.csv"
-    all_data.to_csv(file_path, index=False)
-    print(f"[INFO] Saved combined data to {file_path}")
+    store = FeatureStore(FEATURE_STORE_DIR)
+    store.write_snapshot(all_data, snapshot=timestamp)
+    print(f"[INFO] Saved combined data to {FEATURE_STORE_DIR} (snapshot {timestamp})")
+    if keep_snapshots:
+        store.prune(keep=keep_snapshots)
     return all_data
 
-def train_xgboost_model(n_trees=100, horizon=1):
+def load_features(timestamp=None, compact=False, symbols=None):
+    """
+    Load the feature frame saved by retrieve_data for the given day (default: today).
+    Falls back to the legacy logs/features/feature_df_{date}.csv if there is no snapshot.
+    compact=True returns float32 features, a categorical Symbol and int32 day-number Dates.
+    symbols: only load these symbols.
+    """
+    timestamp = timestamp or cur_date()
+    store = FeatureStore(FEATURE_STORE_DIR)
+    if store.has_snapshot(timestamp):
+        df = store.read(snapshot=timestamp, symbols=symbols)
+    else:
+        file_path = f"logs/features/feature_df_{timestamp}.csv"
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"[ERROR] No feature snapshot for {timestamp}. Run 'retrieve_data' first.")
+        df = pd.read_csv(file_path)
+        if symbols is not None:
+            df = df[df["Symbol"].isin(symbols)]
+    return compact_frame(df) if compact else df
+
+def iter_feature_symbols(compact=False, timestamp=None):
+    """
+    Today's snapshot as (symbol, frame) pairs, read from the feature store one symbol at a
+    time, so only a single symbol's history is ever in memory.
+    """
+    store = FeatureStore(FEATURE_STORE_DIR)
+    timestamp = timestamp or cur_date()
+    for symbol in sorted(store.row_counts(timestamp)):
+        df = store.read(snapshot=timestamp, symbols=[symbol])
+        yield symbol, compact_frame(df) if compact else df
+
+def feature_chunks(memory_budget_mb=None, compact=False, timestamp=None):
+    """
+    Symbol groups of today's snapshot that each fit in memory_budget_mb (default: MEMORY_BUDGET_MB).
+    Returns [None] (= everything at once) when there is no budget or no snapshot to size from.
+    """
+    memory_budget_mb = MEMORY_BUDGET_MB if memory_budget_mb is None else memory_budget_mb
+    store = FeatureStore(FEATURE_STORE_DIR)
+    timestamp = timestamp or cur_date()
+    if not memory_budget_mb or not store.has_snapshot(timestamp):
+        return [None]
+    n_cols = len(FEATURE_COLS) + 5  # OHLCV + features; Date and Symbol are added by row_bytes
+    chunks = plan_symbol_chunks(store.row_counts(timestamp), n_cols, memory_budget_mb, compact)
+    print(f"[INFO] Processing {sum(len(c) for c in chunks)} symbols in {len(chunks)} chunks "
+          f"(budget {memory_budget_mb:g} MB)")
+    return chunks
+
+def train_xgboost_model(n_trees=100, horizon=1, compact=False, memory_budget_mb=None, n_jobs=1,
+                        threads_per_model=None, mode="per_symbol", incremental=False, full_rebuild_days=7,
+                        use_tuned=True, out_of_core=False, external_memory=False, chunk_days=365):
     """
     Step 2: Train XGBoost models on saved data
     python app.py train_xgboost_model --n_trees 200 --horizon 1 
-
+    python app.py train_xgboost_model --compact --memory_budget_mb 1024   (small machines)
+    python app.py train_xgboost_model --n_jobs 8 --threads_per_model 2   (8 symbols at a time)
+    python app.py train_xgboost_model --mode pooled   (one model over the whole universe)
+    python app.py train_xgboost_model --incremental --full_rebuild_days 7   (nightly warm start)
+    Tuned parameters from 'tune' are used when present; --ignore_tuned trains with --n_trees instead.
+    python app.py train_xgboost_model --out_of_core   (per-symbol: one symbol in memory at a time)
+    python app.py train_xgboost_model --mode pooled --out_of_core --chunk_days 365 [--external_memory]
     """
-    timestamp = cur_date()
-    file_path = f"logs/features/feature_df_{timestamp}.csv"
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"[ERROR] {file_path} not found. Run 'retrieve_data' first.")
-    df = pd.read_csv(file_path)
-    train_models(df, n_trees, horizon)
+    if out_of_core:
+        store = FeatureStore(FEATURE_STORE_DIR)
+        timestamp = cur_date()
+        if mode == "pooled":
+            first, last = store.date_range(timestamp)
+            read = lambda start, end: store.read(snapshot=timestamp, start=start, end=end)
+            train_pooled_out_of_core(read, first, last, store.row_counts(timestamp), n_trees, horizon,
+                                     chunk_days=chunk_days, external_memory=external_memory)
+        else:
+            train_models(iter_feature_symbols(compact, timestamp), n_trees, horizon, n_jobs=n_jobs,
+                         threads_per_model=threads_per_model, incremental=incremental,
+                         full_rebuild_days=full_rebuild_days, use_tuned=use_tuned)
+        return
+    if mode == "pooled":
+        # Cross-sectional features need every symbol of a day at once, so no chunking here
+        train_pooled_model(load_features(compact=compact), n_trees, horizon)
+        return
+    for symbols in feature_chunks(memory_budget_mb, compact):
+        df = load_features(compact=compact, symbols=symbols)
+        train_models(df, n_trees, horizon, n_jobs=n_jobs, threads_per_model=threads_per_model,
+                     incremental=incremental, full_rebuild_days=full_rebuild_days, use_tuned=use_tuned)
 
-def xgboost_eval(horizon=1):
+def xgboost_eval(horizon=1, compact=False, memory_budget_mb=None, mode="per_symbol"):
     """
     Step 3: Evaluate XGBoost models and rank predictions
     python app.py xgboost_eval --horizon 1 
+    python app.py xgboost_eval --horizon 1 --mode pooled
     """
-    timestamp = cur_date()
-    file_path = f"logs/features/feature_df_{timestamp}.csv"
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"[ERROR] {file_path} not found. Run 'retrieve_data' first.")
-    df = pd.read_csv(file_path)
-    evaluate_models(df, horizon)
+    if mode == "pooled":
+        evaluate_pooled_model(load_features(compact=compact), horizon)
+        return
+    results = []
+    for symbols in feature_chunks(memory_budget_mb, compact):
+        df = load_features(compact=compact, symbols=symbols)
+        results.append(evaluate_models(df, horizon, save=False))
+    save_rankings(pd.concat(results, ignore_index=True), horizon)
+
+def train_eval_horizons(horizons=(1, 7, 30), n_trees=100, compact=False, memory_budget_mb=None, n_jobs=1,
+                        threads_per_model=None, incremental=False, full_rebuild_days=7):
+    """
+    Steps 2 + 3 for several horizons in one pass over the saved data
+    python app.py train_eval_horizons --horizons 1,7,30 --n_trees 200
+    Rankings are written to logs/rankings/{horizon}/ for every horizon.
+    """
+    results = {h: [] for h in horizons}
+    for symbols in feature_chunks(memory_budget_mb, compact):
+        df = load_features(compact=compact, symbols=symbols)
+        rankings = train_evaluate_horizons(df, horizons, n_trees, n_jobs=n_jobs, threads_per_model=threads_per_model,
+                                           incremental=incremental, full_rebuild_days=full_rebuild_days, save=False)
+        for h, ranking in rankings.items():
+            results[h].append(ranking)
+    for h in horizons:
+        save_rankings(pd.concat(results[h], ignore_index=True), h)
+
+def walk_forward_eval(horizon=1, mode="expanding", test_size=63, step=None, train_size=756, n_trees=100,
+                      compact=False, memory_budget_mb=None):
+    """
+    Walk-forward evaluation with cached fold metrics
+    python app.py walk_forward --horizon 1 --wf_mode rolling --train_size 756 --test_size 63
+    """
+    parts = []
+    for symbols in feature_chunks(memory_budget_mb, compact):
+        df = load_features(compact=compact, symbols=symbols)
+        parts.append(walk_forward(df, horizon, mode, test_size, step, train_size, n_trees=n_trees, save=False))
+    results = pd.concat(parts, ignore_index=True)
+    out_path = f"logs/walk_forward/{horizon}/walk_forward_{cur_date()}.csv"
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    results.to_csv(out_path, index=False)
+    print(f"[SAVED] Walk-forward metrics: {out_path}")
+
+def tune_xgboost(horizon=1, n_trials=32, time_budget=None, max_rounds=1000, n_symbols=20, n_jobs=1,
+                 compact=False):
+    """
+    Search XGBoost parameters for a horizon and save the best to models/{horizon}/best_params.json,
+    which train_xgboost_model then uses
+    python app.py tune --horizon 1 --n_trials 64 --time_budget 1800 --n_jobs 8
+    """
+    tune(load_features(compact=compact), horizon, n_trials=n_trials, time_budget=time_budget,
+         max_rounds=max_rounds, n_symbols=n_symbols, n_jobs=n_jobs)
+
+def compile_models(horizon=1):
+    """
+    Export the trained per-symbol models of a horizon to flat arrays for fast batched scoring
+    python app.py compile_models --horizon 1
+    """
+    export_compiled(horizon)
+
+def load_price_panel(timestamp=None):
+    """
+    (dates, symbols, forward-filled close matrix) from a feature-store snapshot (default: latest).
+    """
+    df = FeatureStore(FEATURE_STORE_DIR).read(snapshot=timestamp, columns=["Close"])
+    dates, symbols, prices = build_price_matrix(df, date_col="Date", symbol_col="Symbol", price_col="Close")
+    return dates, symbols, ffill_matrix(prices)
+
+def _universe(point_in_time):
+    """
+    Point-in-time S&P 500 membership (date -> symbols) for the backtests, or None.
+    """
+    return UniverseStore().members_as_of if point_in_time else None
+
+def backtest(horizon=1, diversity=20, commission=0.0, slippage_bps=5.0, rebalance_every=1, point_in_time=False):
+    """
+    Replay the saved daily rankings of a horizon with daily rebalancing
+    python app.py backtest --horizon 1 --diversity 20 --slippage_bps 5 --commission 0.0005
+    --point_in_time only trades names that were S&P 500 members on each ranking's date.
+    """
+    results = run_rolling_backtest(load_ranking_history(horizon), panel=load_price_panel(), diversity=diversity,
+                                   commission=commission, slippage_bps=slippage_bps,
+                                   rebalance_every=rebalance_every, universe=_universe(point_in_time))
+    out_dir = f"logs/backtests/{horizon}"
+    os.makedirs(out_dir, exist_ok=True)
+    results["equity_curve"].to_csv(f"{out_dir}/equity_{cur_date()}.csv", index=False)
+    results["trades"].to_csv(f"{out_dir}/trades_{cur_date()}.csv", index=False)
+    print(f"[SUMMARY] ROI: {results['roi']:.2%} | Sharpe: {results['sharpe_ratio']:.2f} "
+          f"| Max drawdown: {results['max_drawdown']:.2%} | Costs: ${results['costs']:.2f}")
+    print(f"[SAVED] Backtest: {out_dir}/equity_{cur_date()}.csv")
+    return results
+
+def _values(arg, cast=float):
+    """
+    Parse a comma-separated sweep list; "none" stands for an unset value (e.g. no stop loss).
+    """
+    return [None if v.strip().lower() == "none" else cast(v) for v in arg.split(",")]
+
+def sweep(horizons="1", diversity="10,20", tp="none", sl="none", weighting="predicted", rebalance_every="1",
+          commission=0.0, slippage_bps=5.0, n_jobs=-1, point_in_time=False):
+    """
+    Backtest a grid of settings over the saved rankings in parallel
+    python app.py sweep --sweep_horizons 1,7 --sweep_diversity 10,20,40 --sweep_tp none,0.05,0.1 --sweep_sl none,0.05 --sweep_weighting predicted,equal,rank --n_jobs 8
+    """
+    return run_sweep(load_price_panel(), horizons=_values(horizons, int), diversity=_values(diversity, int),
+                     tp=_values(tp), sl=_values(sl), weighting=weighting.split(","),
+                     rebalance_every=_values(rebalance_every, int), commission=commission,
+                     slippage_bps=slippage_bps, n_jobs=n_jobs, universe=_universe(point_in_time))
 
 def trade(api, diversity, horizon=1):
     """
@@ -93,15 +286,59 @@ def trade(api, diversity, horizon=1):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("command", choices=[
-        "retrieve_data", "train_xgboost_model", "xgboost_eval", 
+        "retrieve_data", "train_xgboost_model", "xgboost_eval", "train_eval_horizons", "walk_forward", "tune", "compile_models", "backtest", "sweep",
         "trade", "monitor_positions", "close_all", "check_account"
     ])
     parser.add_argument("--start_date", type=str, default="2022-01-01")
     parser.add_argument("--end_date", type=str, default="2025-01-01")
     parser.add_argument("--interval", type=str, default="1d")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent download workers")
+    parser.add_argument("--batch_size", type=int, default=1, help="Symbols per upstream request")
+    parser.add_argument("--cache_dir", type=str, default="cache/bars", help="On-disk bar cache ('' to disable)")
+    parser.add_argument("--offline", action="store_true", help="Serve bars from the cache only")
+    parser.add_argument("--keep_snapshots", type=int, default=KEEP_SNAPSHOTS,
+                        help="Feature snapshots retrieve_data keeps (0 = keep all)")
+    parser.add_argument("--as_of", type=str, default=None,
+                        help="retrieve_data: download the S&P 500 members of this YYYY-MM-DD")
+    parser.add_argument("--compact", action="store_true", help="float32/categorical feature frame")
+    parser.add_argument("--memory_budget_mb", type=float, default=None,
+                        help="Train/evaluate in symbol chunks that fit this budget (default: $MEMORY_BUDGET_MB)")
+    parser.add_argument("--mode", choices=["per_symbol", "pooled"], default="per_symbol",
+                        help="One model per symbol, or one pooled cross-sectional model")
     parser.add_argument("--n_trees", type=int, default=100)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip unchanged symbols and warm-start models on new rows")
+    parser.add_argument("--full_rebuild_days", type=int, default=7, help="Days between full rebuilds in incremental mode")
+    parser.add_argument("--n_jobs", type=int, default=1, help="Symbols trained in parallel (-1 = all cores)")
+    parser.add_argument("--threads_per_model", type=int, default=None, help="XGBoost threads per model")
     parser.add_argument("--horizon", type=int, default=1)
+    parser.add_argument("--horizons", type=str, default="1,7,30", help="Comma-separated horizons for train_eval_horizons")
+    parser.add_argument("--wf_mode", choices=["expanding", "rolling"], default="expanding", help="Walk-forward window")
+    parser.add_argument("--train_size", type=int, default=756, help="Rolling walk-forward training rows")
+    parser.add_argument("--test_size", type=int, default=63, help="Walk-forward test rows per fold")
+    parser.add_argument("--step", type=int, default=None, help="Rows between walk-forward folds (default: test_size)")
+    parser.add_argument("--n_trials", type=int, default=32, help="Random-search trials for tune")
+    parser.add_argument("--time_budget", type=float, default=None, help="Wall-clock seconds for tune")
+    parser.add_argument("--max_rounds", type=int, default=1000, help="Most trees a tuning trial may grow")
+    parser.add_argument("--tune_symbols", type=int, default=20, help="Symbols sampled for tuning (0 = all)")
+    parser.add_argument("--ignore_tuned", action="store_true", help="Train with --n_trees and default parameters")
+    parser.add_argument("--out_of_core", action="store_true",
+                        help="Train from the feature store chunk by chunk instead of loading it whole")
+    parser.add_argument("--external_memory", action="store_true",
+                        help="Pooled out-of-core training pages to disk instead of a QuantileDMatrix")
+    parser.add_argument("--chunk_days", type=int, default=365, help="Date window per out-of-core chunk")
     parser.add_argument("--diversity", type=int, default=20)
+    parser.add_argument("--commission", type=float, default=0.0, help="Backtest commission, fraction of notional")
+    parser.add_argument("--slippage_bps", type=float, default=5.0, help="Backtest slippage in basis points")
+    parser.add_argument("--rebalance_every", type=int, default=1, help="Trading days between backtest rebalances")
+    parser.add_argument("--point_in_time", action="store_true",
+                        help="Backtest/sweep only names that were S&P 500 members on each ranking's date")
+    parser.add_argument("--sweep_horizons", type=str, default="1", help="Comma-separated ranking horizons to sweep")
+    parser.add_argument("--sweep_diversity", type=str, default="10,20", help="Comma-separated diversity values to sweep")
+    parser.add_argument("--sweep_tp", type=str, default="none", help="Take-profit values to sweep ('none' = off)")
+    parser.add_argument("--sweep_sl", type=str, default="none", help="Stop-loss values to sweep ('none' = off)")
+    parser.add_argument("--sweep_weighting", type=str, default="predicted", help="predicted, equal and/or rank")
+    parser.add_argument("--sweep_rebalance", type=str, default="1", help="Rebalance intervals to sweep")
     parser.add_argument("--tp", type=float, default=0.1)
     parser.add_argument("--sl", type=float, default=0.05)
     parser.add_argument("--monitor_interval", type=int, default=300)
@@ -116,11 +353,43 @@ if __name__ == "__main__":
 
     # Dispatch commands
     if args.command == "retrieve_data":
-        retrieve_data(start_date=args.start_date, end_date=args.end_date, interval=args.interval)
+        retrieve_data(start_date=args.start_date, end_date=args.end_date, interval=args.interval,
+                      workers=args.workers, batch_size=args.batch_size,
+                      cache_dir=args.cache_dir, offline=args.offline, keep_snapshots=args.keep_snapshots,
+                      as_of=args.as_of)
     elif args.command == "train_xgboost_model":
-        train_xgboost_model(n_trees=args.n_trees, horizon=args.horizon)
+        train_xgboost_model(n_trees=args.n_trees, horizon=args.horizon,
+                            compact=args.compact, memory_budget_mb=args.memory_budget_mb,
+                            n_jobs=args.n_jobs, threads_per_model=args.threads_per_model, mode=args.mode,
+                            incremental=args.incremental, full_rebuild_days=args.full_rebuild_days,
+                            use_tuned=not args.ignore_tuned, out_of_core=args.out_of_core,
+                            external_memory=args.external_memory, chunk_days=args.chunk_days)
     elif args.command == "xgboost_eval":
-        xgboost_eval(horizon=args.horizon)
+        xgboost_eval(horizon=args.horizon, compact=args.compact, memory_budget_mb=args.memory_budget_mb,
+                     mode=args.mode)
+    elif args.command == "train_eval_horizons":
+        train_eval_horizons(horizons=[int(h) for h in args.horizons.split(",")], n_trees=args.n_trees,
+                            compact=args.compact, memory_budget_mb=args.memory_budget_mb, n_jobs=args.n_jobs,
+                            threads_per_model=args.threads_per_model, incremental=args.incremental,
+                            full_rebuild_days=args.full_rebuild_days)
+    elif args.command == "walk_forward":
+        walk_forward_eval(horizon=args.horizon, mode=args.wf_mode, test_size=args.test_size, step=args.step,
+                          train_size=args.train_size, n_trees=args.n_trees, compact=args.compact,
+                          memory_budget_mb=args.memory_budget_mb)
+    elif args.command == "tune":
+        tune_xgboost(horizon=args.horizon, n_trials=args.n_trials, time_budget=args.time_budget,
+                     max_rounds=args.max_rounds, n_symbols=args.tune_symbols, n_jobs=args.n_jobs,
+                     compact=args.compact)
+    elif args.command == "compile_models":
+        compile_models(horizon=args.horizon)
+    elif args.command == "backtest":
+        backtest(horizon=args.horizon, diversity=args.diversity, commission=args.commission,
+                 slippage_bps=args.slippage_bps, rebalance_every=args.rebalance_every,
+                 point_in_time=args.point_in_time)
+    elif args.command == "sweep":
+        sweep(horizons=args.sweep_horizons, diversity=args.sweep_diversity, tp=args.sweep_tp, sl=args.sweep_sl,
+              weighting=args.sweep_weighting, rebalance_every=args.sweep_rebalance, commission=args.commission,
+              slippage_bps=args.slippage_bps, n_jobs=args.n_jobs, point_in_time=args.point_in_time)
     elif args.command == "trade":
         trade(api, diversity=args.diversity, horizon=args.horizon)
     elif args.command == "monitor_positions":
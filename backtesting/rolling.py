@@ -0,0 +1,237 @@
+# rolling.py
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from backtesting.simulator import build_price_matrix, compute_metrics, ffill_matrix
+
+RANKING_FILE = re.compile(r"ticker_model_predictions_(\d{4}-\d{2}-\d{2})\.csv$")
+WEIGHTINGS = ("predicted", "equal", "rank")
+
+
+def load_ranking_history(horizon=1, root="logs/rankings", start=None, end=None):
+    """
+    Every daily ranking CSV the pipeline wrote for a horizon:
+    {Timestamp(date): DataFrame(Symbol, PredictedReturn, ...)} in date order.
+    """
+    folder = os.path.join(root, str(horizon))
+    if not os.path.isdir(folder):
+        raise FileNotFoundError(f"[ERROR] {folder} not found. Run 'xgboost_eval' first.")
+    rankings = {}
+    for name in sorted(os.listdir(folder)):
+        m = RANKING_FILE.match(name)
+        if not m:
+            continue
+        date = pd.Timestamp(m.group(1))
+        if (start is not None and date < pd.Timestamp(start)) or (end is not None and date > pd.Timestamp(end)):
+            continue
+        rankings[date] = pd.read_csv(os.path.join(folder, name))
+    return rankings
+
+
+def rank_weights(predicted, weighting="predicted"):
+    """
+    Weights of names already sorted by PredictedReturn (best first).
+    predicted: PredictedReturn / sum, as trading.alpaca.allocate_portfolio does.
+    equal: 1 / n. rank: n, n-1, ..., 1 normalised to sum to 1.
+    """
+    n = len(predicted)
+    if weighting == "predicted":
+        return predicted / predicted.sum()
+    if weighting == "equal":
+        return np.full(n, 1.0 / n) if n else np.zeros(0)
+    if weighting == "rank":
+        ranks = np.arange(n, 0, -1, dtype=np.float64)
+        return ranks / ranks.sum()
+    raise ValueError(f"Unknown weighting {weighting!r}, expected one of {WEIGHTINGS}")
+
+
+def portfolio_weights(ranking, diversity, weighting="predicted"):
+    """
+    The top `diversity` rows by PredictedReturn and their weights (by default the same
+    weighting as trading.alpaca.allocate_portfolio). Returns (symbols, weights).
+    """
+    predicted = ranking["PredictedReturn"].to_numpy(dtype=np.float64)
+    top = np.argsort(-predicted, kind="stable")[:diversity]
+    return ranking["Symbol"].to_numpy()[top], rank_weights(predicted[top], weighting)
+
+
+def rank_table(rankings, dates, symbols, max_names=None, lag=0, first=0, last=None, universe=None):
+    """
+    Resolve the rankings against a price panel once: {day: (columns, predicted)} with the
+    day index each ranking is acted on (its own date, or the next trading day when it falls
+    on a holiday, plus `lag` days) and its names best first as price-matrix columns (-1 for
+    names without prices), cut to max_names. A later ranking for the same day replaces an
+    earlier one. Any diversity / weighting up to max_names can then be planned without
+    touching the DataFrames again (see plan_targets).
+    universe: optional callable date -> member symbols on that date (e.g.
+    data.universe.UniverseStore().members_as_of); each ranking is then cut to the names that
+    were members on its date, so the backtest never buys a name that only joined later.
+    """
+    dates = pd.DatetimeIndex(dates)
+    last = len(dates) if last is None else last
+    col_index = {s: i for i, s in enumerate(symbols)}
+    table = {}
+    for date, ranking in rankings.items():
+        d = int(dates.searchsorted(pd.Timestamp(date))) + lag
+        if d < first or d >= last:
+            continue
+        if universe is not None:
+            ranking = ranking[ranking["Symbol"].isin(set(universe(date)))]
+        predicted = ranking["PredictedReturn"].to_numpy(dtype=np.float64)
+        top = np.argsort(-predicted, kind="stable")[:max_names]
+        cols = np.array([col_index.get(s, -1) for s in ranking["Symbol"].to_numpy()[top]], dtype=np.int64)
+        table[d] = (cols, predicted[top])
+    return table
+
+
+def plan_targets(table, diversity, weighting="predicted"):
+    """
+    {day: (columns, weights)} for one diversity / weighting from a rank_table.
+    """
+    plan = {}
+    for d, (cols, predicted) in table.items():
+        weights = rank_weights(predicted[:diversity], weighting)
+        cols = cols[:diversity]
+        plan[d] = (cols[cols >= 0], weights[cols >= 0])
+    return plan
+
+
+def simulate(prices, plan, first, last, initial_capital=10000, commission=0.0, slippage_bps=5.0,
+             rebalance_every=1, take_profit=None, stop_loss=None, record_trades=True):
+    """
+    Core day loop of run_rolling_backtest over rows first..last of a forward-filled price
+    matrix. Returns (values, cash, positions, trades) arrays; trades is a list of
+    (days, columns, qty, price, cost) array tuples (empty with record_trades=False).
+    """
+    slip = slippage_bps / 10_000
+    cash = float(initial_capital)
+    shares = np.zeros(prices.shape[1])
+    entry = np.zeros(prices.shape[1])  # average fill price of the open position
+    held = np.zeros(0, dtype=np.int64)
+    last_rebalance = None
+
+    values = np.empty(last - first)
+    cash_curve = np.empty(last - first)
+    n_positions = np.empty(last - first, dtype=np.int64)
+    trades = []
+
+    def fill(d, c, q, price, row):
+        nonlocal cash
+        fees = np.abs(q) * price * commission
+        cash -= float(q @ price + fees.sum())
+        buy = q > 0
+        if buy.any():
+            cb, qb = c[buy], q[buy]
+            entry[cb] = (shares[cb] * entry[cb] + qb * price[buy]) / (shares[cb] + qb)
+        shares[c] += q
+        if record_trades:
+            trades.append((np.full(len(c), d), c, q, price, fees + np.abs(q) * row[c] * slip))
+
+    for step, d in enumerate(range(first, last)):
+        row = prices[d]
+        target = plan.get(d)
+        if target is not None and (last_rebalance is None or d - last_rebalance >= rebalance_every):
+            cols, weights = target
+            priced = ~np.isnan(row[cols])
+            cols, weights = cols[priced], weights[priced]
+            buy = weights > 0
+            cols, weights = cols[buy], weights[buy]
+            if weights.sum() > 1:
+                weights = weights / weights.sum()
+
+            equity = cash + float(shares[held] @ row[held])
+            goal = np.floor(equity * weights / (row[cols] * (1 + slip) * (1 + commission)))
+
+            # Sells first (frees cash), then buys; only names held or targeted are touched
+            touched = np.union1d(held, cols)
+            new = np.zeros(len(touched))
+            new[np.searchsorted(touched, cols)] = goal
+            delta = new - shares[touched]
+            for side, sign in ((delta < 0, -1), (delta > 0, 1)):
+                c, q = touched[side], delta[side]
+                if not len(c):
+                    continue
+                price = row[c] * (1 + sign * slip)
+                if sign > 0:
+                    need = float(q @ price) * (1 + commission)
+                    if need > cash:
+                        # Rounding left the buys short of cash: trim them pro rata
+                        q = np.floor(q * cash / need)
+                        c, q, price = c[q > 0], q[q > 0], price[q > 0]
+                fill(d, c, q, price, row)
+            held = touched[shares[touched] != 0]
+            last_rebalance = d
+        elif len(held) and (take_profit is not None or stop_loss is not None):
+            # Between rebalances, exit at the close the way monitor_positions does live
+            change = row[held] / entry[held] - 1
+            exit_now = np.zeros(len(held), dtype=bool)
+            if take_profit is not None:
+                exit_now |= change >= take_profit
+            if stop_loss is not None:
+                exit_now |= change <= -stop_loss
+            if exit_now.any():
+                c = held[exit_now]
+                fill(d, c, -shares[c], row[c] * (1 - slip), row)
+                held = held[~exit_now]
+
+        values[step] = cash + float(shares[held] @ row[held]) if len(held) else cash
+        cash_curve[step] = cash
+        n_positions[step] = len(held)
+    return values, cash_curve, n_positions, trades
+
+
+def run_rolling_backtest(rankings, price_history_df=None, panel=None, diversity=20, initial_capital=10000,
+                         commission=0.0, slippage_bps=5.0, rebalance_every=1, lag=0, start=None, end=None,
+                         take_profit=None, stop_loss=None, weighting="predicted", universe=None):
+    """
+    Event-driven replay of the daily rankings.
+
+    rankings: {date: ranking DataFrame} (see load_ranking_history).
+    Prices come from price_history_df (columns symbol, date, close) or from a prebuilt
+    panel = (dates, symbols, prices) with a forward-filled date x symbol price matrix.
+
+    The engine steps through every trading day. On a day that has a ranking, and at least
+    rebalance_every trading days after the last rebalance, it rebalances into that ranking's
+    top `diversity` names with allocate_portfolio's weights (weighting="predicted"; "equal"
+    and "rank" are also available). It sells everything outside the target, then trades
+    every held name to floor(equity * weight / price) shares. Names with a non-positive
+    weight are not bought (allocate_portfolio skips qty <= 0). Buy weights summing above 1
+    are scaled down, so the book is never levered.
+    On the days in between, take_profit / stop_loss (fractions, None = off) close a position
+    whose close moved that far from its average entry, as monitor_positions does live; the
+    cash waits for the next rebalance.
+    universe: point-in-time membership, date -> symbols (see rank_table); None trades the
+    rankings as saved.
+    Fills are at the day's close, moved against the trade by slippage_bps; commission is a
+    fraction of the traded notional. A trade's cost is its commission plus its slippage.
+
+    Prices are looked up by precomputed column index, and only held names are valued each
+    day, so the run is linear in days x positions.
+    Returns the simulator metrics plus equity_curve (date, value, cash, positions, returns)
+    and trades (date, symbol, qty, price, cost) DataFrames.
+    """
+    if panel is None:
+        dates, symbols, prices = build_price_matrix(price_history_df)
+        prices = ffill_matrix(prices)
+    else:
+        dates, symbols, prices = panel
+    dates = pd.DatetimeIndex(dates)
+    first = dates.searchsorted(pd.Timestamp(start)) if start is not None else 0
+    last = dates.searchsorted(pd.Timestamp(end), side="right") if end is not None else len(dates)
+    table = rank_table(rankings, dates, symbols, diversity, lag, first, last, universe)
+    values, cash_curve, n_positions, trades = simulate(
+        prices, plan_targets(table, diversity, weighting), first, last, initial_capital, commission,
+        slippage_bps, rebalance_every, take_profit, stop_loss,
+    )
+
+    metrics = compute_metrics(values, initial_capital)
+    equity_df = pd.DataFrame({"date": dates[first:last], "value": values, "cash": cash_curve,
+                              "positions": n_positions, "returns": metrics.pop("returns")})
+    day, col, qty, price, cost = (np.concatenate(a) for a in zip(*trades)) if trades else [np.zeros(0, int)] * 5
+    trades_df = pd.DataFrame({"date": dates[day], "symbol": np.asarray(symbols, dtype=object)[col],
+                              "qty": qty, "price": price, "cost": cost})
+    return {**metrics, "trades": trades_df, "turnover": float((trades_df["qty"].abs() * trades_df["price"]).sum()),
+            "costs": float(trades_df["cost"].sum()), "equity_curve": equity_df}
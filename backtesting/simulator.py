@@ -1,71 +1,118 @@
 import pandas as pd
 import numpy as np
 
-def run_backtest_with_metrics(prediction_csv_path, price_history_df, initial_capital=10000):
-    # Load predictions
-    predictions = pd.read_csv(prediction_csv_path)
-    predictions = predictions.sort_values(by="PredictedReturn", ascending=False)
-    predictions["Weight"] = predictions["PredictedReturn"] / predictions["PredictedReturn"].sum()
+TRADING_DAYS = 252
+
+
+def build_price_matrix(price_history_df, symbols=None, date_col="date", symbol_col="symbol", price_col="close"):
+    """
+    Align long-format price history (one row per symbol and date) into a date x symbol matrix.
+    Returns (dates, symbols, prices): sorted unique dates, the column symbols (all symbols in
+    the history, or `symbols` in that order) and a float64 matrix with NaN where a symbol has
+    no price. Duplicate (date, symbol) rows keep the last one.
+    """
+    date_codes, dates = pd.factorize(pd.to_datetime(price_history_df[date_col]), sort=True)
+    if symbols is None:
+        sym_codes, symbols = pd.factorize(price_history_df[symbol_col], sort=True)
+        symbols = list(symbols)
+    else:
+        symbols = list(symbols)
+        sym_codes = pd.Index(symbols).get_indexer(price_history_df[symbol_col])
+
+    prices = np.full((len(dates), len(symbols)), np.nan)
+    keep = sym_codes >= 0
+    prices[date_codes[keep], sym_codes[keep]] = price_history_df[price_col].to_numpy(dtype=np.float64)[keep]
+    return pd.DatetimeIndex(dates), symbols, prices
+
+
+def ffill_matrix(prices):
+    """
+    Forward-fill NaNs down each column (last known price); leading NaNs stay NaN.
+    """
+    valid = ~np.isnan(prices)
+    idx = np.where(valid, np.arange(len(prices))[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    filled = prices[idx, np.arange(prices.shape[1])]
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return filled
+
+
+def first_prices(prices):
+    """
+    First available price of every column (NaN for columns without any).
+    """
+    valid = ~np.isnan(prices)
+    first = valid.argmax(axis=0)
+    out = prices[first, np.arange(prices.shape[1])]
+    out[~valid.any(axis=0)] = np.nan
+    return out
 
-    portfolio = {}
-    capital_used = 0
-    daily_equity = []
-
-    # Allocate capital
-    for _, row in predictions.iterrows():
-        symbol = row["Symbol"]
-        weight = row["Weight"]
-        allocation = weight * initial_capital
-
-        # Use the first price available in price history for this symbol
-        price_series = price_history_df[price_history_df["symbol"] == symbol]
-        if price_series.empty:
-            continue
-        entry_price = price_series.iloc[0]["close"]
-        qty = int(allocation // entry_price)
-        capital_used += qty * entry_price
-
-        portfolio[symbol] = {
-            "shares": qty,
-            "entry_price": entry_price,
-            "prices": price_series.set_index("date")["close"]
-        }
-
-    # Compute daily portfolio value
-    all_dates = sorted(price_history_df["date"].unique())
-    for date in all_dates:
-        value = 0
-        for pos in portfolio.values():
-            if date in pos["prices"]:
-                value += pos["shares"] * pos["prices"][date]
-            else:
-                value += pos["shares"] * pos["entry_price"]  # fallback to entry price
-        daily_equity.append({"date": date, "value": value})
-
-    equity_df = pd.DataFrame(daily_equity)
-    equity_df["returns"] = equity_df["value"].pct_change().fillna(0)
-
-    # Metrics
-    final_value = equity_df.iloc[-1]["value"]
-    net_return = final_value - initial_capital
-    roi = net_return / initial_capital
-    sharpe_ratio = np.mean(equity_df["returns"]) / np.std(equity_df["returns"]) * np.sqrt(252) if np.std(equity_df["returns"]) > 0 else 0
-    rolling_max = equity_df["value"].cummax()
-    drawdown = equity_df["value"] / rolling_max - 1
-    max_drawdown = drawdown.min()
-    volatility = equity_df["returns"].std() * np.sqrt(252)
-
-    results = {
+
+def equity_curve(holdings, prices, cash=0.0):
+    """
+    Portfolio value per date: cash + sum(holdings * prices).
+    holdings: shares per symbol, constant (n_symbols,) or per date (n_dates, n_symbols).
+    prices: forward-filled date x symbol matrix; positions without a price count as 0.
+    cash: scalar or per-date array.
+    """
+    priced = np.nan_to_num(prices)
+    if np.ndim(holdings) == 1:
+        value = priced @ holdings
+    else:
+        value = np.einsum("ij,ij->i", holdings, priced)
+    return value + cash
+
+
+def compute_metrics(values, initial_capital, periods_per_year=TRADING_DAYS):
+    """
+    Return, risk and drawdown metrics of an equity curve, from arrays only.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    returns = np.zeros(len(values))
+    if len(values) > 1:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns[1:] = np.where(values[:-1] != 0, values[1:] / values[:-1] - 1, 0.0)
+    final_value = float(values[-1]) if len(values) else float(initial_capital)
+    std = returns.std()
+    drawdown = values / np.maximum.accumulate(values) - 1 if len(values) else np.zeros(1)
+    return {
         "initial_capital": initial_capital,
         "final_value": final_value,
-        "net_return": net_return,
-        "roi": roi,
-        "sharpe_ratio": sharpe_ratio,
-        "max_drawdown": max_drawdown,
-        "volatility": volatility,
-        "equity_curve": equity_df
+        "net_return": final_value - initial_capital,
+        "roi": (final_value - initial_capital) / initial_capital,
+        "sharpe_ratio": returns.mean() / std * np.sqrt(periods_per_year) if std > 0 else 0,
+        "max_drawdown": float(np.nanmin(drawdown)),
+        "volatility": returns.std(ddof=1) * np.sqrt(periods_per_year) if len(returns) > 1 else 0.0,
+        "returns": returns,
     }
 
-    import ace_tools as tools; tools.display_dataframe_to_user(name="Equity Curve", dataframe=equity_df)
-    return results
 
+def run_backtest_with_metrics(prediction_csv_path, price_history_df, initial_capital=10000):
+    """
+    Buy-and-hold backtest of one prediction CSV: capital is split by PredictedReturn weight
+    (PredictedReturn / sum), every position is bought at its first price in price_history_df
+    (columns: symbol, date, close) and held to the end. The equity curve is cash plus the
+    holdings valued at the forward-filled close of each date.
+    """
+    predictions = pd.read_csv(prediction_csv_path)
+    predictions = predictions.sort_values(by="PredictedReturn", ascending=False, kind="stable")
+    # A symbol listed twice keeps its best prediction (the price matrix needs unique columns)
+    predictions = predictions.drop_duplicates(subset="Symbol", keep="first")
+    predictions["Weight"] = predictions["PredictedReturn"] / predictions["PredictedReturn"].sum()
+
+    dates, symbols, prices = build_price_matrix(price_history_df, symbols=predictions["Symbol"])
+    prices = ffill_matrix(prices)
+    entry = first_prices(prices)
+
+    allocation = predictions["Weight"].to_numpy() * initial_capital
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = np.where(np.isnan(entry), 0, np.floor(allocation / entry))
+    capital_used = float(np.nansum(shares * entry))
+
+    # Before its first price a position is still worth what was paid for it
+    prices = np.where(np.isnan(prices), entry, prices)
+    values = equity_curve(shares, prices, cash=initial_capital - capital_used)
+
+    metrics = compute_metrics(values, initial_capital)
+    equity_df = pd.DataFrame({"date": dates, "value": values, "returns": metrics.pop("returns")})
+    return {**metrics, "capital_used": capital_used, "equity_curve": equity_df}
@@ -0,0 +1,142 @@
+# sweep.py
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtesting.rolling import load_ranking_history, plan_targets, rank_table, simulate
+from backtesting.simulator import compute_metrics
+
+# Per-process sweep state, set once per worker by _init_worker
+_PRICES = None
+_SHM = None
+_TABLES = {}
+_FIXED = {}
+_PLANS = {}
+
+
+def _init_worker(shm_name, shape, dtype, tables, fixed, prices=None):
+    """
+    Attach to the shared price panel (no copy) and keep the rank tables of every horizon.
+    A serial run passes the prices array itself instead of a shared-memory name.
+    """
+    global _PRICES, _SHM, _TABLES, _FIXED, _PLANS
+    if shm_name is None:
+        _PRICES = prices
+    else:
+        _SHM = shared_memory.SharedMemory(name=shm_name)
+        _PRICES = np.ndarray(shape, dtype=dtype, buffer=_SHM.buf)
+    _TABLES, _FIXED, _PLANS = tables, fixed, {}
+
+
+def _run_config(config):
+    """
+    Backtest one grid point against the shared panel. Returns config + metrics.
+    """
+    key = (config["horizon"], config["diversity"], config["weighting"])
+    if key not in _PLANS:
+        _PLANS[key] = plan_targets(_TABLES[config["horizon"]], config["diversity"], config["weighting"])
+    values, _, _, _ = simulate(
+        _PRICES, _PLANS[key], _FIXED["first"], _FIXED["last"], _FIXED["initial_capital"], _FIXED["commission"],
+        _FIXED["slippage_bps"], config["rebalance_every"], config["tp"], config["sl"], record_trades=False,
+    )
+    m = compute_metrics(values, _FIXED["initial_capital"])
+    return {**config, "total_return": m["roi"], "sharpe_ratio": m["sharpe_ratio"],
+            "max_drawdown": m["max_drawdown"], "volatility": m["volatility"], "final_value": m["final_value"]}
+
+
+def parameter_grid(horizons=(1,), diversity=(20,), tp=(None,), sl=(None,), weighting=("predicted",),
+                   rebalance_every=(1,)):
+    """
+    Every combination of the swept values as a list of config dicts.
+    """
+    keys = ("horizon", "diversity", "tp", "sl", "weighting", "rebalance_every")
+    return [dict(zip(keys, values))
+            for values in itertools.product(horizons, diversity, tp, sl, weighting, rebalance_every)]
+
+
+def run_sweep(panel, horizons=(1,), diversity=(20,), tp=(None,), sl=(None,), weighting=("predicted",),
+              rebalance_every=(1,), rankings=None, rankings_root="logs/rankings", initial_capital=10000,
+              commission=0.0, slippage_bps=5.0, start=None, end=None, n_jobs=-1, save=True, universe=None):
+    """
+    Backtest every combination of horizon, diversity, take profit, stop loss, weighting and
+    rebalance interval with the rolling engine, in parallel.
+
+    panel: (dates, symbols, prices) with a forward-filled price matrix. It is copied once
+    into shared memory; every worker maps it as a read-only NumPy view, so the panel is
+    neither pickled per task nor copied per process. The rankings of each horizon
+    (rankings={horizon: {date: DataFrame}}, or read from rankings_root) are resolved to
+    price columns once in this process and handed to each worker once. Horizons without a
+    rankings folder are skipped with a warning. universe: point-in-time membership,
+    date -> symbols (see rolling.rank_table).
+    tp / sl: fractions, None for no take profit / stop loss.
+
+    Returns one row per configuration with total_return, sharpe_ratio, max_drawdown,
+    volatility and final_value, best Sharpe first, and saves it to
+    logs/backtests/sweep_{date}.csv.
+    """
+    t0 = time.perf_counter()
+    dates, symbols, prices = panel
+    dates = pd.DatetimeIndex(dates)
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    first = int(dates.searchsorted(pd.Timestamp(start))) if start is not None else 0
+    last = int(dates.searchsorted(pd.Timestamp(end), side="right")) if end is not None else len(dates)
+
+    max_names = max(diversity)
+    tables = {}
+    for h in horizons:
+        try:
+            history = rankings[h] if rankings is not None else load_ranking_history(h, rankings_root)
+        except FileNotFoundError:
+            print(f"[WARNING] No rankings for horizon {h} under {rankings_root}, skipping it.")
+            continue
+        tables[h] = rank_table(history, dates, symbols, max_names, first=first, last=last, universe=universe)
+    if not tables:
+        raise FileNotFoundError(f"[ERROR] No rankings for horizons {list(horizons)} under {rankings_root}. "
+                                f"Run 'xgboost_eval' first.")
+    horizons = list(tables)
+    fixed = {"first": first, "last": last, "initial_capital": initial_capital, "commission": commission,
+             "slippage_bps": slippage_bps}
+    grid = parameter_grid(horizons, diversity, tp, sl, weighting, rebalance_every)
+
+    n_jobs = (os.cpu_count() or 1) if n_jobs == -1 else max(1, n_jobs)
+    n_jobs = min(n_jobs, len(grid))
+    print(f"[INFO] Sweeping {len(grid)} configurations over {last - first} days x {len(symbols)} symbols "
+          f"with {n_jobs} processes")
+
+    if n_jobs == 1:
+        _init_worker(None, prices.shape, prices.dtype, tables, fixed, prices=prices)
+        rows = [_run_config(config) for config in grid]
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=prices.nbytes)
+        try:
+            np.ndarray(prices.shape, dtype=prices.dtype, buffer=shm.buf)[:] = prices
+            # spawn: forking after XGBoost/OpenMP has run in this process can deadlock the children
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=ctx, initializer=_init_worker,
+                                     initargs=(shm.name, prices.shape, prices.dtype, tables, fixed)) as pool:
+                # Grid points of the same horizon/diversity/weighting share a worker-side plan
+                rows = list(pool.map(_run_config, grid, chunksize=max(1, len(grid) // (4 * n_jobs))))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    results = pd.DataFrame(rows).sort_values("sharpe_ratio", ascending=False).reset_index(drop=True)
+    print(f"[SUMMARY] {len(results)} configurations in {time.perf_counter() - t0:.1f}s")
+    best = results.iloc[0]
+    print(f"[SUMMARY] Best Sharpe {best['sharpe_ratio']:.2f}: horizon={best['horizon']} diversity={best['diversity']} "
+          f"tp={best['tp']} sl={best['sl']} weighting={best['weighting']} rebalance_every={best['rebalance_every']} "
+          f"| Return: {best['total_return']:.2%} | Max drawdown: {best['max_drawdown']:.2%}")
+
+    if save:
+        os.makedirs("logs/backtests", exist_ok=True)
+        out_path = f"logs/backtests/sweep_{datetime.now().strftime('%Y-%m-%d')}.csv"
+        results.to_csv(out_path, index=False)
+        print(f"[SAVED] Sweep results: {out_path}")
+    return results
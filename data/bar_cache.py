@@ -0,0 +1,194 @@
+# bar_cache.py
+import json
+import os
+import threading
+from collections import defaultdict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data.bulk_download import flatten_ohlcv
+
+COVERAGE_KEY = b"quant_dashboard.coverage"
+
+
+class BarCache:
+    """
+    Persistent OHLCV cache: one zstd-compressed parquet file per symbol and interval
+    under {root}/{interval}/{symbol}.parquet ({root}/{interval}-adjusted/ for auto_adjust
+    bars, so adjusted and raw prices are never mixed).
+
+    Each file remembers the [start, end) range the upstream has answered for, so a request
+    only downloads the missing head and/or tail. A range only counts as answered when bars
+    came back for it, and a tail only up to its last returned bar: yfinance returns an empty
+    frame instead of raising on errors and rate limits. With offline=True the upstream is
+    never called and requests are answered from disk alone.
+    """
+    def __init__(self, root="cache/bars", offline=False, fetch_fn=None, batch_fetch_fn=None):
+        self.root = root
+        self.offline = offline
+        if not offline and (fetch_fn is None or batch_fetch_fn is None):
+            from data.yahoo_data import get_historical_data, get_historical_data_batch
+            fetch_fn = fetch_fn or get_historical_data
+            batch_fetch_fn = batch_fetch_fn or get_historical_data_batch
+        self.fetch_fn = fetch_fn
+        self.batch_fetch_fn = batch_fetch_fn
+        self._locks = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+
+    def _path(self, symbol, interval, auto_adjust=False):
+        folder = f"{interval}-adjusted" if auto_adjust else interval
+        return os.path.join(self.root, folder, f"{symbol}.parquet")
+
+    def _lock(self, symbol, interval, auto_adjust=False):
+        with self._locks_guard:
+            return self._locks[(symbol, interval, bool(auto_adjust))]
+
+    def read(self, symbol, interval="1d", auto_adjust=False):
+        """
+        Return (bars, (covered_start, covered_end)) from disk, or (None, None) if not cached.
+        """
+        path = self._path(symbol, interval, auto_adjust)
+        if not os.path.exists(path):
+            return None, None
+        table = pq.read_table(path)
+        meta = json.loads((table.schema.metadata or {}).get(COVERAGE_KEY, b"null"))
+        df = table.to_pandas()
+        if meta is None:
+            coverage = (df.index.min(), df.index.max() + pd.Timedelta(days=1))
+        else:
+            coverage = (pd.Timestamp(meta[0]), pd.Timestamp(meta[1]))
+        return df, coverage
+
+    def _write(self, symbol, interval, auto_adjust, df, coverage):
+        path = self._path(symbol, interval, auto_adjust)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df)
+        meta = dict(table.schema.metadata or {})
+        meta[COVERAGE_KEY] = json.dumps([coverage[0].isoformat(), coverage[1].isoformat()]).encode()
+        table = table.replace_schema_metadata(meta)
+        tmp = path + ".tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+
+    def _missing_ranges(self, coverage, start, end):
+        if coverage is None:
+            return [(start, end)]
+        ranges = []
+        if start < coverage[0]:
+            ranges.append((start, coverage[0]))
+        if end > coverage[1]:
+            ranges.append((coverage[1], end))
+        return ranges
+
+    @staticmethod
+    def _answered(coverage, ranges, fetched):
+        """
+        Coverage after fetching ranges (the missing head and/or tail of coverage): a range
+        with no bars leaves it unchanged, a head extends it down to the requested start and
+        a tail (or a first download) only up to the day after its last returned bar.
+        """
+        lo, hi = coverage if coverage is not None else (None, None)
+        for (start, end), df in zip(ranges, fetched):
+            if df is None or df.empty:
+                continue
+            last = df.index.max()
+            last = (last.tz_localize(None) if last.tz is not None else last).normalize() + pd.Timedelta(days=1)
+            if coverage is not None and end <= coverage[0]:
+                lo = start
+            else:
+                lo = start if lo is None else lo
+                hi = max(hi, min(end, last)) if hi is not None else min(end, last)
+        return None if lo is None else (lo, hi)
+
+    def _merge(self, symbol, interval, auto_adjust, cached, coverage, fetched, ranges):
+        """
+        Fold freshly downloaded bars for ranges into the cached ones and persist them.
+        """
+        parts = [df for df in [cached] + fetched if df is not None and not df.empty]
+        merged = pd.concat(parts) if parts else pd.DataFrame()
+        if not merged.empty:
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+
+        covered = self._answered(coverage, ranges, fetched)
+        if covered is not None and not merged.empty and covered != coverage:
+            # Never mark today as complete: its bar is still forming and must be re-fetched
+            lo, hi = covered
+            self._write(symbol, interval, auto_adjust, merged, (lo, min(hi, pd.Timestamp.now().normalize())))
+        return merged
+
+    @staticmethod
+    def _slice(df, start, end):
+        if df is None or df.empty:
+            return pd.DataFrame()
+        index = df.index
+        if getattr(index, "tz", None) is not None:
+            start, end = start.tz_localize(index.tz), end.tz_localize(index.tz)
+        return df[(index >= start) & (index < end)]
+
+    def get_historical_data(self, symbol, start="2022-01-01", end="2025-01-01", interval="1d", auto_adjust=False):
+        """
+        Same signature as data.yahoo_data.get_historical_data, served through the cache.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        with self._lock(symbol, interval, auto_adjust):
+            cached, coverage = self.read(symbol, interval, auto_adjust)
+            if not self.offline:
+                ranges = self._missing_ranges(coverage, start, end)
+                fetched = []
+                for lo, hi in ranges:
+                    df = self.fetch_fn(symbol, start=lo.strftime("%Y-%m-%d"), end=hi.strftime("%Y-%m-%d"),
+                                       interval=interval, auto_adjust=auto_adjust)
+                    fetched.append(flatten_ohlcv(df) if df is not None else None)
+                if ranges:
+                    cached = self._merge(symbol, interval, auto_adjust, cached, coverage, fetched, ranges)
+        return self._slice(cached, start, end)
+
+    def get_historical_data_batch(self, symbols, start="2022-01-01", end="2025-01-01", interval="1d", auto_adjust=False):
+        """
+        Batched variant: symbols missing the same range share one upstream request.
+        Symbols the upstream did not return are left out so the caller retries them one by one.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        plans, by_range = {}, defaultdict(list)
+        for symbol in symbols:
+            cached, coverage = self.read(symbol, interval, auto_adjust)
+            ranges = [] if self.offline else self._missing_ranges(coverage, start, end)
+            plans[symbol] = (cached, coverage, ranges)
+            for r in ranges:
+                by_range[r].append(symbol)
+
+        fetched = defaultdict(dict)
+        for (lo, hi), batch in by_range.items():
+            frames = self.batch_fetch_fn(batch, start=lo.strftime("%Y-%m-%d"), end=hi.strftime("%Y-%m-%d"),
+                                         interval=interval, auto_adjust=auto_adjust)
+            for symbol, df in frames.items():
+                fetched[symbol][(lo, hi)] = flatten_ohlcv(df)
+
+        out = {}
+        for symbol, (cached, coverage, ranges) in plans.items():
+            if any(r not in fetched[symbol] for r in ranges):
+                continue
+            if ranges:
+                with self._lock(symbol, interval, auto_adjust):
+                    cached = self._merge(symbol, interval, auto_adjust, cached, coverage,
+                                         [fetched[symbol][r] for r in ranges], ranges)
+            df = self._slice(cached, start, end)
+            if not df.empty:
+                out[symbol] = df
+        return out
+
+
+def cached_download_kwargs(cache_dir="cache/bars", offline=False):
+    """
+    Keyword arguments that route data.bulk_download.download_symbols through a BarCache.
+    Returns {} when cache_dir is empty so callers can pass the result through unconditionally.
+    """
+    if not cache_dir:
+        return {}
+    cache = BarCache(cache_dir, offline=offline)
+    kwargs = dict(fetch_fn=cache.get_historical_data, batch_fetch_fn=cache.get_historical_data_batch)
+    if offline:
+        kwargs["max_retries"] = 0  # nothing to retry when the disk is the only source
+    return kwargs
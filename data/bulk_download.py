@@ -0,0 +1,238 @@
+# bulk_download.py
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all download workers.
+    Caps the number of upstream requests per second no matter how many threads are running.
+    """
+    def __init__(self, rate_per_sec=5.0, burst=None):
+        self.rate = float(rate_per_sec) if rate_per_sec else 0.0
+        self.capacity = float(burst if burst is not None else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class FakeDataSource:
+    """
+    Offline stand-in for Yahoo Finance with the same call signatures as
+    data.yahoo_data.get_historical_data / get_historical_data_batch.
+    Bars are a deterministic random walk per symbol; latency and failures are simulated
+    so throughput of the bulk downloader can be measured without network access.
+    """
+    def __init__(self, latency=0.05, failure_rate=0.0, fail_symbols=None, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_symbols = set(fail_symbols or [])
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _maybe_fail(self, symbol):
+        with self.lock:
+            self.calls += 1
+            flaky = self.rng.random() < self.failure_rate
+        if symbol in self.fail_symbols:
+            raise RuntimeError(f"no data for {symbol}")
+        if flaky:
+            raise ConnectionError(f"simulated transient error for {symbol}")
+
+    def _bars(self, symbol, start, end, interval="1d"):
+        # Generate the same fixed history every time so overlapping requests agree
+        dates = pd.date_range("2000-01-03", "2035-01-01", inclusive="left", name="Date")
+        dates = dates[dates.dayofweek < 5]
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        rets = rng.normal(0.0003, 0.02, len(dates))
+        close = 50 * np.exp(np.cumsum(rets))
+        open_ = close * (1 + rng.normal(0, 0.005, len(dates)))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, len(dates))))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, len(dates))))
+        volume = rng.integers(1_000_000, 10_000_000, len(dates))
+        df = pd.DataFrame({
+            "Adj Close": close, "Close": close, "High": high,
+            "Low": low, "Open": open_, "Volume": volume,
+        }, index=dates)
+        return df[(df.index >= pd.to_datetime(start)) & (df.index < pd.to_datetime(end))]
+
+    def get_historical_data(self, symbol, start="2022-01-01", end="2025-01-01", interval="1d", auto_adjust=False):
+        time.sleep(self.latency)
+        self._maybe_fail(symbol)
+        return self._bars(symbol, start, end, interval)
+
+    def get_historical_data_batch(self, symbols, start="2022-01-01", end="2025-01-01", interval="1d", auto_adjust=False):
+        time.sleep(self.latency)
+        frames = {}
+        for symbol in symbols:
+            try:
+                self._maybe_fail(symbol)
+            except Exception:
+                continue  # yfinance silently drops tickers it could not fetch
+            frames[symbol] = self._bars(symbol, start, end, interval)
+        return frames
+
+
+def flatten_ohlcv(df):
+    """
+    Drop the ticker level yfinance adds to the columns of single-symbol downloads.
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.droplevel(1)
+    return df
+
+
+def _fetch_with_retry(fetch_fn, symbol, start, end, interval, auto_adjust, limiter, max_retries, backoff):
+    """
+    Fetch one symbol, retrying with exponential backoff + jitter.
+    Returns (DataFrame, retries_used); raises the last error once retries are exhausted.
+    """
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            df = fetch_fn(symbol, start=start, end=end, interval=interval, auto_adjust=auto_adjust)
+            if df is None or df.empty:
+                raise ValueError("empty response")
+            return df, attempt
+        except Exception:
+            if attempt >= max_retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) + random.uniform(0, backoff))
+            attempt += 1
+
+
+def download_symbols(symbols, start="2022-01-01", end="2025-01-01", interval="1d", auto_adjust=False,
+                     max_workers=8, batch_size=1, max_retries=3, backoff=1.0, rate_limit=5.0,
+                     fetch_fn=None, batch_fetch_fn=None, verbose=True):
+    """
+    Download OHLCV for many symbols at once.
+
+    start may be a single date or a {symbol: start} dict for per-symbol windows.
+    batch_size > 1 asks the upstream for that many tickers per request (symbols sharing the
+    same start); anything a batch did not return is retried one symbol at a time. All requests go through a shared
+    rate limiter and a bounded pool of max_workers threads.
+
+    Returns (frames, summary): frames is {symbol: DataFrame with flat columns}, summary
+    holds counts, retries, elapsed time and the error for every symbol that failed.
+    """
+    if fetch_fn is None or (batch_size > 1 and batch_fetch_fn is None):
+        from data.yahoo_data import get_historical_data, get_historical_data_batch
+        fetch_fn = fetch_fn or get_historical_data
+        batch_fetch_fn = batch_fetch_fn or get_historical_data_batch
+
+    symbols = list(dict.fromkeys(symbols))
+    starts = start if isinstance(start, dict) else {s: start for s in symbols}
+    limiter = RateLimiter(rate_limit)
+    frames, failed = {}, {}
+    retries = 0
+    t0 = time.perf_counter()
+
+    pending = symbols
+    if batch_size > 1:
+        by_start = {}
+        for s in symbols:
+            by_start.setdefault(starts[s], []).append(s)
+        batches = [group[i:i + batch_size] for group in by_start.values()
+                   for i in range(0, len(group), batch_size)]
+
+        def run_batch(batch):
+            limiter.acquire()
+            return batch_fetch_fn(batch, start=starts[batch[0]], end=end, interval=interval, auto_adjust=auto_adjust)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(run_batch, b): b for b in batches}
+            for fut in as_completed(futures):
+                try:
+                    for symbol, df in fut.result().items():
+                        if df is not None and not df.empty:
+                            frames[symbol] = flatten_ohlcv(df)
+                except Exception as e:
+                    if verbose:
+                        print(f"[WARNING] Batch of {len(futures[fut])} symbols failed: {e}")
+        pending = [s for s in symbols if s not in frames]
+        if verbose and pending:
+            print(f"[INFO] Retrying {len(pending)} symbols individually")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_fetch_with_retry, fetch_fn, s, starts[s], end, interval, auto_adjust,
+                        limiter, max_retries, backoff): s
+            for s in pending
+        }
+        for fut in as_completed(futures):
+            symbol = futures[fut]
+            try:
+                df, n = fut.result()
+                frames[symbol] = flatten_ohlcv(df)
+                retries += n
+                if verbose:
+                    print(f"[INFO] Pulled {symbol}")
+            except Exception as e:
+                retries += max_retries
+                failed[symbol] = str(e)
+                if verbose:
+                    print(f"[WARNING] Failed to pull {symbol}: {e}")
+
+    elapsed = time.perf_counter() - t0
+    summary = {
+        "requested": len(symbols),
+        "succeeded": len(frames),
+        "failed": failed,
+        "retries": retries,
+        "elapsed_sec": elapsed,
+        "symbols_per_sec": len(frames) / elapsed if elapsed > 0 else float("inf"),
+    }
+    if verbose:
+        print_download_summary(summary)
+    return frames, summary
+
+
+def print_download_summary(summary):
+    print(f"\n[SUMMARY] Downloaded {summary['succeeded']}/{summary['requested']} symbols "
+          f"in {summary['elapsed_sec']:.1f}s ({summary['symbols_per_sec']:.1f} symbols/s, "
+          f"{summary['retries']} retries)")
+    if summary["failed"]:
+        print(f"[SUMMARY] {len(summary['failed'])} failed:")
+        for symbol, err in sorted(summary["failed"].items()):
+            print(f" - {symbol}: {err}")
+
+
+if __name__ == "__main__":
+    # Offline throughput check: sequential vs pooled vs batched against the fake source
+    symbols = [f"SYM{i:03d}" for i in range(100)]
+    source = FakeDataSource(latency=0.05, failure_rate=0.05, fail_symbols=["SYM013"])
+    common = dict(start="2020-01-01", end="2025-01-01", backoff=0.01, rate_limit=0,
+                  fetch_fn=source.get_historical_data,
+                  batch_fetch_fn=source.get_historical_data_batch, verbose=False)
+
+    for label, kwargs in [
+        ("sequential", dict(max_workers=1)),
+        ("pool x16", dict(max_workers=16)),
+        ("batch 50 x4", dict(max_workers=4, batch_size=50)),
+    ]:
+        _, summary = download_symbols(symbols, **common, **kwargs)
+        print(f"{label:>12}: {summary['symbols_per_sec']:.1f} symbols/s, "
+              f"{len(summary['failed'])} failed, {summary['retries']} retries")
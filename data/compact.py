@@ -0,0 +1,77 @@
+# compact.py
+import os
+
+import numpy as np
+import pandas as pd
+
+# Columns kept in float64 even in compact mode: targets are computed from Close
+PRICE_COLUMNS = ["Close"]
+EPOCH = pd.Timestamp("1970-01-01")
+
+# Optional default budget for training/evaluation frames; 0 means unlimited
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", "0") or 0)
+
+
+def compact_frame(df):
+    """
+    Shrink a feature frame in place of the float64/object layout:
+    float32 features, categorical Symbol and Date as int32 days since 1970-01-01.
+    Close stays float64 so forward-return targets keep full precision.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col in PRICE_COLUMNS or col in ("Date", "Symbol"):
+            continue
+        if pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype(np.float32)
+    if "Symbol" in df.columns:
+        df["Symbol"] = df["Symbol"].astype("category")
+    if "Date" in df.columns and not pd.api.types.is_integer_dtype(df["Date"]):
+        df["Date"] = ((pd.to_datetime(df["Date"]) - EPOCH).dt.days).astype(np.int32)
+    return df
+
+
+def restore_dates(dates):
+    """
+    Turn int32 day numbers from compact_frame back into Timestamps (no-op for datetimes).
+    """
+    if pd.api.types.is_integer_dtype(dates):
+        return EPOCH + pd.to_timedelta(dates.astype(np.int64), unit="D")
+    return pd.to_datetime(dates)
+
+
+def row_bytes(n_numeric_cols, compact=False):
+    """
+    Approximate in-memory bytes per row of a feature frame with n_numeric_cols numeric
+    columns plus Date and Symbol (object strings cost ~60 bytes, categorical codes ~2).
+    """
+    if compact:
+        return 4 * n_numeric_cols + 4 * len(PRICE_COLUMNS) + 4 + 2
+    return 8 * n_numeric_cols + 8 + 60
+
+
+def plan_symbol_chunks(row_counts, n_numeric_cols, budget_mb=None, compact=False):
+    """
+    Split symbols into groups whose frames stay under budget_mb each.
+    row_counts is {symbol: rows}. With no budget every symbol goes into one group.
+    A single symbol larger than the budget still gets a group of its own.
+    """
+    budget_mb = MEMORY_BUDGET_MB if budget_mb is None else budget_mb
+    symbols = sorted(row_counts)
+    if not budget_mb:
+        return [symbols] if symbols else []
+
+    per_row = row_bytes(n_numeric_cols, compact)
+    # Training makes a few working copies (sorted group, X, train/test slices)
+    limit = budget_mb * 1024 * 1024 / 3
+    chunks, current, used = [], [], 0
+    for symbol in symbols:
+        size = row_counts[symbol] * per_row
+        if current and used + size > limit:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(symbol)
+        used += size
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,220 @@
+# feature_registry.py
+import numpy as np
+import pandas as pd
+
+# Raw bar columns every feature ultimately depends on
+RAW_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class Feature:
+    """
+    A node in the feature graph.
+    inputs are raw columns or other nodes; lookback is how many prior bars this node needs
+    on top of its inputs. Public nodes are output columns, the rest are shared intermediates.
+    fn works column-wise, so it takes one symbol's Series or a date x symbol DataFrame alike.
+    """
+    def __init__(self, name, inputs, fn, lookback=0, public=True):
+        self.name = name
+        self.inputs = inputs
+        self.fn = fn
+        self.lookback = lookback
+        self.public = public
+
+
+REGISTRY = {}
+
+
+def register(name, inputs, lookback=0, public=True):
+    """
+    Decorator adding fn(*input_series) -> Series to the registry under `name`.
+    """
+    def wrap(fn):
+        REGISTRY[name] = Feature(name, inputs, fn, lookback, public)
+        return fn
+    return wrap
+
+
+# ----------------------------
+# Shared intermediates
+# ----------------------------
+register("prev_close", ["Close"], lookback=1, public=False)(lambda c: c.shift())
+register("daily_return", ["Close"], lookback=1, public=False)(lambda c: c.pct_change(1))
+register("close_delta", ["Close"], lookback=1, public=False)(lambda c: c.diff())
+register("close_ma_22", ["Close"], lookback=21, public=False)(lambda c: c.rolling(22).mean())
+register("ema_12", ["Close"], lookback=12, public=False)(lambda c: c.ewm(span=12, adjust=False).mean())
+register("ema_26", ["Close"], lookback=26, public=False)(lambda c: c.ewm(span=26, adjust=False).mean())
+
+
+@register("true_range", ["High", "Low", "prev_close"], public=False)
+def _true_range(high, low, prev_close):
+    high_low = high - low
+    high_close_prev = (high - prev_close).abs()
+    low_close_prev = (low - prev_close).abs()
+    # Element-wise max skipping NaN (the first bar has no previous close)
+    return np.fmax(np.fmax(high_low, high_close_prev), low_close_prev)
+
+
+# ----------------------------
+# Output columns (public.market_data order)
+# ----------------------------
+register("return_1", ["daily_return"])(lambda r: r)
+register("return_5", ["Close"], lookback=5)(lambda c: c.pct_change(5))
+register("return_22", ["Close"], lookback=22)(lambda c: c.pct_change(22))
+register("return_252", ["Close"], lookback=252)(lambda c: c.pct_change(252))
+
+register("ma_5", ["Close"], lookback=4)(lambda c: c.rolling(5).mean())
+register("ma_10", ["Close"], lookback=9)(lambda c: c.rolling(10).mean())
+register("ma_20", ["Close"], lookback=19)(lambda c: c.rolling(20).mean())
+register("ma_5_20_ratio", ["ma_5", "ma_20"])(lambda ma5, ma20: ma5 / (ma20 + 1e-6))  # avoid div by 0
+
+
+@register("rsi_14", ["close_delta"], lookback=13)
+def _rsi(delta, period=14):
+    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    rs = gain / (loss + 1e-6)
+    return 100 - (100 / (1 + rs))
+
+
+register("vol_5", ["daily_return"], lookback=4)(lambda r: r.rolling(5).std())
+register("vol_10", ["daily_return"], lookback=9)(lambda r: r.rolling(10).std())
+
+
+@register("gk_vol", ["Open", "High", "Low", "Close"])
+def _gk_vol(open_, high, low, close):
+    log_hl = np.log(high / low)
+    log_co = np.log(close / open_)
+    return np.sqrt(0.5 * log_hl**2 - (2*np.log(2)-1) * log_co**2)
+
+
+@register("bollinger_b", ["Close", "close_ma_22"])
+def _bollinger_b(close, ma):
+    std = ma  # compute_bollinger_bands uses the rolling mean here as well
+    upper = ma + 2 * std
+    lower = ma - 2 * std
+    return (close - lower) / (upper - lower + 1e-6)
+
+
+register("atr", ["true_range"], lookback=13)(lambda tr: tr.rolling(14).mean())
+register("macd", ["ema_12", "ema_26"])(lambda e12, e26: e12 - e26)
+register("macd_signal", ["macd"], lookback=9)(lambda m: m.ewm(span=9, adjust=False).mean())
+register("dollar_volume", ["Close", "Volume"])(lambda c, v: c * v)
+
+
+# ----------------------------
+# Other periods, registered on first use as non-output nodes
+# ----------------------------
+def _check_period(period):
+    if isinstance(period, bool) or not isinstance(period, (int, np.integer)) or period < 1:
+        raise ValueError(f"period must be a positive integer, got {period!r}")
+    return int(period)
+
+
+def rsi_node(period=14):
+    """
+    Name of the RSI node over `period` bars (rsi_14 is the output column).
+    """
+    period = _check_period(period)
+    name = f"rsi_{period}"
+    if name not in REGISTRY:
+        register(name, ["close_delta"], lookback=period - 1, public=False)(lambda d: _rsi(d, period))
+    return name
+
+
+def bollinger_node(period=22):
+    """
+    Name of the Bollinger %B node over `period` bars (period 22 is the bollinger_b column).
+    """
+    period = _check_period(period)
+    if period == 22:
+        return "bollinger_b"
+    ma = f"close_ma_{period}"
+    if ma not in REGISTRY:
+        register(ma, ["Close"], lookback=period - 1, public=False)(lambda c: c.rolling(period).mean())
+    name = f"bollinger_b_{period}"
+    if name not in REGISTRY:
+        register(name, ["Close", ma], public=False)(_bollinger_b)
+    return name
+
+
+def atr_node(period=14):
+    """
+    Name of the average true range node over `period` bars (period 14 is the atr column).
+    """
+    period = _check_period(period)
+    if period == 14:
+        return "atr"
+    name = f"atr_{period}"
+    if name not in REGISTRY:
+        register(name, ["true_range"], lookback=period - 1, public=False)(lambda tr: tr.rolling(period).mean())
+    return name
+
+
+# ----------------------------
+# Graph helpers
+# ----------------------------
+def feature_columns():
+    """
+    Names of all output features, in registration (= table) order.
+    """
+    return [name for name, f in REGISTRY.items() if f.public]
+
+
+def feature_lookback(name):
+    """
+    Total number of prior bars `name` needs, following its inputs down to the raw columns.
+    """
+    if name in RAW_COLUMNS:
+        return 0
+    f = REGISTRY[name]
+    return f.lookback + max((feature_lookback(i) for i in f.inputs), default=0)
+
+
+def resolve(columns):
+    """
+    Dependency-ordered list of the nodes needed to produce `columns`.
+    """
+    order, seen = [], set()
+
+    def visit(name):
+        if name in seen or name in RAW_COLUMNS:
+            return
+        if name not in REGISTRY:
+            raise KeyError(f"Unknown feature: {name}")
+        seen.add(name)
+        for dep in REGISTRY[name].inputs:
+            visit(dep)
+        order.append(name)
+
+    for c in columns:
+        visit(c)
+    return order
+
+
+def evaluate(raw, columns=None):
+    """
+    {name: values} of the requested features (default: all) from raw, a mapping of the raw
+    columns to one symbol's Series or to date x symbol DataFrames (see data.panel_features).
+    Only the dependency subgraph of `columns` is evaluated and every intermediate is
+    computed once, however many features share it.
+    """
+    columns = feature_columns() if columns is None else list(columns)
+    values = {}
+    for name in resolve(columns):
+        f = REGISTRY[name]
+        values[name] = f.fn(*[values[i] if i in values else raw[i] for i in f.inputs])
+    return {name: values[name] for name in columns}
+
+
+def compute_features(df, columns=None):
+    """
+    Add the requested feature columns (default: all) to df and return it (see evaluate).
+    Rows are not dropped.
+    """
+    for name, values in evaluate(df, columns).items():
+        df[name] = values
+    return df
+
+
+FEATURE_COLS = feature_columns()
+MAX_LOOKBACK = max(feature_lookback(c) for c in FEATURE_COLS)
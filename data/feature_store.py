@@ -0,0 +1,237 @@
+# feature_store.py
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+
+class FeatureStore:
+    """
+    Columnar, versioned store for the daily feature frame.
+
+    Rows are partitioned by symbol and year into zstd parquet files named after a hash of
+    their contents:
+        {root}/parts/symbol={S}/year={Y}/{digest}.parquet
+    A snapshot is a small JSON manifest listing the partition files it consists of:
+        {root}/snapshots/{YYYY-MM-DD}.json
+    Partitions that did not change since an earlier snapshot hash to the same file, so a new
+    daily snapshot only writes the partitions that actually got new rows (normally the
+    current year of every symbol).
+    """
+    def __init__(self, root="logs/feature_store"):
+        self.root = root
+        self.parts_dir = os.path.join(root, "parts")
+        self.snapshots_dir = os.path.join(root, "snapshots")
+
+    # ----------------------------
+    # Snapshots
+    # ----------------------------
+    def snapshots(self):
+        """
+        Sorted list of snapshot names (dates) available in the store.
+        """
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        return sorted(f[:-5] for f in os.listdir(self.snapshots_dir) if f.endswith(".json"))
+
+    def has_snapshot(self, snapshot):
+        return os.path.exists(self._manifest_path(snapshot))
+
+    def _manifest_path(self, snapshot):
+        return os.path.join(self.snapshots_dir, f"{snapshot}.json")
+
+    def _manifest(self, snapshot=None):
+        if snapshot is None:
+            names = self.snapshots()
+            if not names:
+                raise FileNotFoundError(f"[ERROR] No snapshots in {self.root}. Run 'retrieve_data' first.")
+            snapshot = names[-1]
+        path = self._manifest_path(snapshot)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"[ERROR] Snapshot {snapshot} not found in {self.root}.")
+        with open(path) as f:
+            return json.load(f)
+
+    def row_counts(self, snapshot=None):
+        """
+        Rows per symbol in a snapshot (default: latest), from the manifest alone: {symbol: rows}.
+        """
+        counts = {}
+        for p in self._manifest(snapshot)["partitions"]:
+            counts[p["symbol"]] = counts.get(p["symbol"], 0) + p["rows"]
+        return counts
+
+    def date_range(self, snapshot=None):
+        """
+        (first, last) Date of a snapshot (default: latest), from the manifest alone.
+        """
+        parts = self._manifest(snapshot)["partitions"]
+        if not parts:
+            return None, None
+        return (pd.Timestamp(min(p["min_date"] for p in parts)),
+                pd.Timestamp(max(p["max_date"] for p in parts)))
+
+    # ----------------------------
+    # Write
+    # ----------------------------
+    @staticmethod
+    def _digest(part):
+        h = hashlib.sha1()
+        h.update(json.dumps([list(map(str, part.columns)), list(map(str, part.dtypes))]).encode())
+        h.update(pd.util.hash_pandas_object(part, index=False).values.tobytes())
+        return h.hexdigest()[:20]
+
+    def write_snapshot(self, df, snapshot=None):
+        """
+        Store df (must have 'Date' and 'Symbol' columns) as snapshot `snapshot` (default: today).
+        Returns the manifest dict.
+        """
+        snapshot = snapshot or datetime.now().strftime("%Y-%m-%d")
+        df = df.copy()
+        df["Date"] = pd.to_datetime(df["Date"])
+        df = df.sort_values(["Symbol", "Date"], kind="stable")
+
+        partitions, written = [], 0
+        for (symbol, year), part in df.groupby(["Symbol", df["Date"].dt.year], sort=False):
+            part = part.reset_index(drop=True)
+            rel = os.path.join("parts", f"symbol={symbol}", f"year={year}", f"{self._digest(part)}.parquet")
+            path = os.path.join(self.root, rel)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = path + ".tmp"
+                pq.write_table(pa.Table.from_pandas(part, preserve_index=False), tmp, compression="zstd")
+                os.replace(tmp, path)
+                written += 1
+            partitions.append({
+                "symbol": symbol,
+                "year": int(year),
+                "path": rel,
+                "rows": len(part),
+                "min_date": part["Date"].iloc[0].strftime("%Y-%m-%d"),
+                "max_date": part["Date"].iloc[-1].strftime("%Y-%m-%d"),
+            })
+
+        manifest = {
+            "snapshot": snapshot,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "columns": list(df.columns),
+            "rows": int(len(df)),
+            "partitions": partitions,
+        }
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        tmp = self._manifest_path(snapshot) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path(snapshot))
+        print(f"[INFO] Feature snapshot {snapshot}: {len(partitions)} partitions, "
+              f"{written} new, {len(partitions) - written} shared with earlier snapshots")
+        return manifest
+
+    # ----------------------------
+    # Read
+    # ----------------------------
+    def read(self, snapshot=None, columns=None, symbols=None, start=None, end=None, memory_map=True):
+        """
+        Load a snapshot (default: latest) as a DataFrame sorted by Symbol, Date.
+
+        columns: only read these columns ('Date' and 'Symbol' are always included).
+        symbols / start / end: partitions outside the filter are skipped without being opened,
+            and the Date range [start, end) is pushed down to the parquet row groups.
+        memory_map: memory-map the partition files instead of reading them into buffers.
+        """
+        manifest = self._manifest(snapshot)
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        symbol_set = set(symbols) if symbols is not None else None
+
+        paths = []
+        for p in manifest["partitions"]:
+            if symbol_set is not None and p["symbol"] not in symbol_set:
+                continue
+            if start is not None and pd.Timestamp(p["max_date"]) < start:
+                continue
+            if end is not None and pd.Timestamp(p["min_date"]) >= end:
+                continue
+            paths.append(os.path.join(self.root, p["path"]))
+
+        if columns is not None:
+            columns = ["Date", "Symbol"] + [c for c in columns if c not in ("Date", "Symbol")]
+        if not paths:
+            return pd.DataFrame(columns=columns or manifest["columns"])
+
+        dataset = ds.dataset(paths, format="parquet", filesystem=fs.LocalFileSystem(use_mmap=memory_map))
+        expr = None
+        if start is not None:
+            expr = ds.field("Date") >= start
+        if end is not None:
+            expr = (ds.field("Date") < end) if expr is None else expr & (ds.field("Date") < end)
+        df = dataset.to_table(columns=columns, filter=expr).to_pandas()
+        return df.sort_values(["Symbol", "Date"], kind="stable").reset_index(drop=True)
+
+    # ----------------------------
+    # Housekeeping
+    # ----------------------------
+    def prune(self, keep=30):
+        """
+        Delete all but the newest `keep` snapshots (keep >= 1) and any partition files no
+        longer referenced.
+        """
+        if keep < 1:
+            raise ValueError("keep must be at least 1")
+        names = self.snapshots()
+        for name in names[:-keep]:
+            os.remove(self._manifest_path(name))
+
+        referenced = set()
+        for name in self.snapshots():
+            referenced.update(p["path"] for p in self._manifest(name)["partitions"])
+
+        removed = 0
+        for dirpath, _, files in os.walk(self.parts_dir):
+            for f in files:
+                rel = os.path.relpath(os.path.join(dirpath, f), self.root)
+                if rel not in referenced:
+                    os.remove(os.path.join(dirpath, f))
+                    removed += 1
+        print(f"[INFO] Pruned feature store to {len(self.snapshots())} snapshots, removed {removed} partition files")
+
+
+if __name__ == "__main__":
+    # Write a week of daily snapshots of a growing frame, then prune to the newest three
+    import tempfile
+    import numpy as np
+
+    dates = pd.bdate_range("2023-01-02", "2024-12-31")
+    frame = pd.DataFrame({
+        "Date": np.tile(dates, 3),
+        "Symbol": np.repeat(["AAA", "BBB", "CCC"], len(dates)),
+        "Close": np.random.default_rng(0).lognormal(0, 0.01, 3 * len(dates)).cumprod(),
+    })
+
+    with tempfile.TemporaryDirectory() as root:
+        store = FeatureStore(root)
+        days = list(dates[-7:])
+        for day in days:
+            store.write_snapshot(frame[frame["Date"] <= day], snapshot=day.strftime("%Y-%m-%d"))
+        on_disk = lambda: {os.path.relpath(os.path.join(d, f), root)
+                           for d, _, files in os.walk(store.parts_dir) for f in files}
+        before = len(on_disk())
+        store.prune(keep=3)
+
+        kept = store.snapshots()
+        assert kept == [d.strftime("%Y-%m-%d") for d in days[-3:]], kept
+        # Left on disk: exactly the files the kept manifests reference, i.e. each symbol's
+        # shared 2023 partition plus one 2024 partition per kept snapshot
+        referenced = {p["path"] for name in kept for p in store._manifest(name)["partitions"]}
+        assert on_disk() == referenced, on_disk() ^ referenced
+        assert len(referenced) == 3 * (1 + len(kept)) < before, (len(referenced), before)
+        for name in kept:
+            expected = frame[frame["Date"] <= pd.Timestamp(name)].reset_index(drop=True)
+            pd.testing.assert_frame_equal(store.read(name), expected, check_dtype=False)
+        print(f"snapshots: 7 -> {len(kept)} | partition files: {before} -> {len(on_disk())}")
@@ -0,0 +1,349 @@
+# incremental_features.py
+import json
+import math
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from data.feature_engineering import FEATURE_COLS, MAX_LOOKBACK
+
+
+class RollingWindow:
+    """
+    Fixed-size window keeping a running sum and sum of squares.
+    The sums are rebuilt from the buffer once per full turn, so float drift cannot accumulate.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.buf = deque(maxlen=size)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.pushes = 0
+
+    def push(self, x):
+        if len(self.buf) == self.size:
+            old = self.buf[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.buf.append(x)
+        self.total += x
+        self.total_sq += x * x
+        self.pushes += 1
+        if self.pushes % self.size == 0:
+            self.total = math.fsum(self.buf)
+            self.total_sq = math.fsum(v * v for v in self.buf)
+
+    @property
+    def full(self):
+        return len(self.buf) == self.size
+
+    def mean(self):
+        return self.total / self.size if self.full else np.nan
+
+    def std(self):
+        # Sample std (ddof=1), same as pandas rolling().std()
+        if not self.full:
+            return np.nan
+        var = (self.total_sq - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(var, 0.0))
+
+    def to_dict(self):
+        return {"size": self.size, "buf": list(self.buf), "total": self.total, "total_sq": self.total_sq,
+                "pushes": self.pushes}
+
+    @classmethod
+    def from_dict(cls, d):
+        w = cls(d["size"])
+        w.buf.extend(d["buf"])
+        w.total, w.total_sq, w.pushes = d["total"], d["total_sq"], d["pushes"]
+        return w
+
+
+class Ema:
+    """
+    Exponential moving average matching pandas ewm(span=..., adjust=False).
+    """
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1)
+        self.value = None
+
+    def push(self, x):
+        self.value = x if self.value is None else self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+    def to_dict(self):
+        return {"alpha": self.alpha, "value": self.value}
+
+    @classmethod
+    def from_dict(cls, d):
+        e = cls(1)
+        e.alpha, e.value = d["alpha"], d["value"]
+        return e
+
+
+class IncrementalFeatureState:
+    """
+    Rolling state for one symbol. update() folds in one bar in O(1) and returns the same
+    feature values compute_return_features would produce for that row, or None while the
+    longest window (return_252) is still warming up -- the rows the batch dropna() removes.
+    """
+    def __init__(self):
+        self.closes = deque(maxlen=MAX_LOOKBACK + 1)
+        self.ma = {n: RollingWindow(n) for n in (5, 10, 20)}
+        self.boll_ma = RollingWindow(22)
+        self.gains = RollingWindow(14)
+        self.losses = RollingWindow(14)
+        self.rets = {n: RollingWindow(n) for n in (5, 10)}
+        self.tr = RollingWindow(14)
+        self.ema_12 = Ema(12)
+        self.ema_26 = Ema(26)
+        self.signal = Ema(9)
+        self.prev_close = None
+
+    def to_dict(self):
+        """
+        JSON-serialisable copy of the state (floats round-trip exactly).
+        """
+        return {
+            "closes": list(self.closes),
+            "ma": {str(n): w.to_dict() for n, w in self.ma.items()},
+            "boll_ma": self.boll_ma.to_dict(),
+            "gains": self.gains.to_dict(),
+            "losses": self.losses.to_dict(),
+            "rets": {str(n): w.to_dict() for n, w in self.rets.items()},
+            "tr": self.tr.to_dict(),
+            "ema_12": self.ema_12.to_dict(),
+            "ema_26": self.ema_26.to_dict(),
+            "signal": self.signal.to_dict(),
+            "prev_close": self.prev_close,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls()
+        state.closes.extend(d["closes"])
+        state.ma = {int(n): RollingWindow.from_dict(w) for n, w in d["ma"].items()}
+        state.rets = {int(n): RollingWindow.from_dict(w) for n, w in d["rets"].items()}
+        for name in ("boll_ma", "gains", "losses", "tr"):
+            setattr(state, name, RollingWindow.from_dict(d[name]))
+        for name in ("ema_12", "ema_26", "signal"):
+            setattr(state, name, Ema.from_dict(d[name]))
+        state.prev_close = d["prev_close"]
+        return state
+
+    def _pct(self, k):
+        if len(self.closes) <= k:
+            return np.nan
+        return self.closes[-1] / self.closes[-1 - k] - 1
+
+    def update(self, open_, high, low, close, volume):
+        prev = self.prev_close
+        self.closes.append(close)
+
+        # RSI gain/loss windows and return volatility start at the second bar (diff/pct_change)
+        if prev is not None:
+            delta = close - prev
+            self.gains.push(delta if delta > 0 else 0.0)
+            self.losses.push(-delta if delta < 0 else 0.0)
+            ret = close / prev - 1
+            for w in self.rets.values():
+                w.push(ret)
+
+        for w in self.ma.values():
+            w.push(close)
+        self.boll_ma.push(close)
+
+        # True range; the first bar has no previous close, so it is just high - low
+        tr = high - low
+        if prev is not None:
+            tr = max(tr, abs(high - prev), abs(low - prev))
+        self.tr.push(tr)
+
+        macd = self.ema_12.push(close) - self.ema_26.push(close)
+        macd_signal = self.signal.push(macd)
+        self.prev_close = close
+
+        if len(self.closes) <= MAX_LOOKBACK:
+            return None
+
+        ma_5, ma_10, ma_20 = self.ma[5].mean(), self.ma[10].mean(), self.ma[20].mean()
+        rs = self.gains.mean() / (self.losses.mean() + 1e-6)
+        # Bollinger matches compute_bollinger_bands, which uses the rolling mean as its width
+        boll = self.boll_ma.mean()
+        upper, lower = boll + 2 * boll, boll - 2 * boll
+        log_hl = math.log(high / low)
+        log_co = math.log(close / open_)
+        gk = 0.5 * log_hl ** 2 - (2 * math.log(2) - 1) * log_co ** 2
+
+        return {
+            "return_1": self._pct(1),
+            "return_5": self._pct(5),
+            "return_22": self._pct(22),
+            "return_252": self._pct(252),
+            "ma_5": ma_5,
+            "ma_10": ma_10,
+            "ma_20": ma_20,
+            "ma_5_20_ratio": ma_5 / (ma_20 + 1e-6),
+            "rsi_14": 100 - (100 / (1 + rs)),
+            "vol_5": self.rets[5].std(),
+            "vol_10": self.rets[10].std(),
+            "gk_vol": math.sqrt(gk) if gk >= 0 else np.nan,
+            "bollinger_b": (close - lower) / (upper - lower + 1e-6),
+            "atr": self.tr.mean(),
+            "macd": macd,
+            "macd_signal": macd_signal,
+            "dollar_volume": close * volume,
+        }
+
+
+class IncrementalFeatureEngine:
+    """
+    Per-symbol incremental feature computation for daily or intraday updates.
+
+        engine = IncrementalFeatureEngine("cache/feature_state")
+        engine.warm_up("AAPL", history_df)         # replay stored bars once
+        engine.save("AAPL")                        # snapshot the state with its last bar date
+        ...
+        engine.extend("AAPL", new_bars_df)         # later run: load the snapshot, fold only newer bars
+
+    Rows come back with the public.market_data columns (OHLCV, features, Date, Symbol).
+    With a state_dir every symbol's state is kept in {state_dir}/{symbol}.json, keyed by the
+    Date of the last bar folded into it.
+    """
+    def __init__(self, state_dir=None):
+        self.states = {}
+        self.last_dates = {}
+        self.state_dir = state_dir
+
+    def _state(self, symbol):
+        if symbol not in self.states:
+            self.states[symbol] = IncrementalFeatureState()
+        return self.states[symbol]
+
+    def update(self, symbol, bar, date=None):
+        """
+        Fold one bar (mapping with Open/High/Low/Close/Volume) into the symbol's state.
+        Returns the feature row, or None while the state is still warming up.
+        """
+        feats = self._state(symbol).update(
+            float(bar["Open"]), float(bar["High"]), float(bar["Low"]),
+            float(bar["Close"]), float(bar["Volume"]),
+        )
+        if date is not None:
+            self.last_dates[symbol] = pd.Timestamp(date)
+        if feats is None or any(isinstance(v, float) and math.isnan(v) for v in feats.values()):
+            return None
+        row = {"Date": date, "Close": bar["Close"], "High": bar["High"], "Low": bar["Low"],
+               "Open": bar["Open"], "Volume": bar["Volume"]}
+        row.update(feats)
+        row["Symbol"] = symbol
+        return row
+
+    def warm_up(self, symbol, df):
+        """
+        Replay a symbol's history (indexed by Date) through a fresh state.
+        Returns the feature frame for the replayed bars, equivalent to compute_return_features.
+        """
+        self.states[symbol] = IncrementalFeatureState()
+        self.last_dates.pop(symbol, None)
+        return self._replay(symbol, df)
+
+    def _replay(self, symbol, df):
+        rows = []
+        for date, bar in zip(df.index, df[["Open", "High", "Low", "Close", "Volume"]].to_dict("records")):
+            row = self.update(symbol, bar, date)
+            if row is not None:
+                rows.append(row)
+        out = pd.DataFrame(rows)
+        return out.set_index("Date") if not out.empty else out
+
+    def extend(self, symbol, df):
+        """
+        Fold only the bars of df (indexed by Date) after the symbol's last folded bar into its
+        state (loaded from state_dir if needed). Returns the feature frame of those bars; the
+        cost depends on the new bars only, not on the length of the history.
+        """
+        if symbol not in self.states and self.load(symbol) is None:
+            raise KeyError(f"No feature state for {symbol}; warm_up() it first")
+        last = self.last_dates.get(symbol)
+        return self._replay(symbol, df[df.index > last] if last is not None else df)
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+    def _state_path(self, symbol):
+        return os.path.join(self.state_dir, f"{symbol}.json")
+
+    def save(self, symbol):
+        """
+        Write the symbol's state and last bar date to {state_dir}/{symbol}.json.
+        """
+        path = self._state_path(symbol)
+        os.makedirs(self.state_dir, exist_ok=True)
+        last = self.last_dates.get(symbol)
+        snapshot = {"symbol": symbol, "last_date": last.strftime("%Y-%m-%d") if last is not None else None,
+                    "state": self.states[symbol].to_dict()}
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+        return path
+
+    def load(self, symbol):
+        """
+        Restore the symbol's saved state. Returns its last bar date, or None when nothing is saved.
+        """
+        if self.state_dir is None or not os.path.exists(self._state_path(symbol)):
+            return None
+        with open(self._state_path(symbol)) as f:
+            snapshot = json.load(f)
+        self.states[symbol] = IncrementalFeatureState.from_dict(snapshot["state"])
+        last = snapshot["last_date"]
+        self.last_dates[symbol] = pd.Timestamp(last) if last is not None else None
+        return self.last_dates[symbol]
+
+    def saved_dates(self, symbols):
+        """
+        {symbol: last bar date} of the saved states among symbols, read without keeping them.
+        """
+        out = {}
+        for symbol in symbols:
+            if self.state_dir is None or not os.path.exists(self._state_path(symbol)):
+                continue
+            with open(self._state_path(symbol)) as f:
+                last = json.load(f)["last_date"]
+            if last is not None:
+                out[symbol] = pd.Timestamp(last)
+        return out
+
+
+if __name__ == "__main__":
+    # Check the incremental engine against the batch functions on synthetic bars
+    import time
+    from data.bulk_download import FakeDataSource
+    from data.feature_engineering import compute_return_features
+
+    bars = FakeDataSource(latency=0).get_historical_data("AAPL", "2010-01-01", "2025-01-01")
+    batch = compute_return_features(bars.copy())
+
+    engine = IncrementalFeatureEngine()
+    t0 = time.perf_counter()
+    inc = engine.warm_up("AAPL", bars)
+    per_bar = (time.perf_counter() - t0) / len(bars)
+
+    diff = (inc[FEATURE_COLS] - batch[FEATURE_COLS]).abs() / (batch[FEATURE_COLS].abs() + 1e-12)
+    print(f"rows: incremental {len(inc)} / batch {len(batch)}")
+    print(f"max relative difference: {diff.max().max():.2e}")
+    print(f"update cost: {per_bar * 1e6:.1f} us/bar")
+
+    # Save after part of the history, restore in a fresh engine and extend with the rest
+    import tempfile
+    with tempfile.TemporaryDirectory() as state_dir:
+        first = IncrementalFeatureEngine(state_dir)
+        first.warm_up("AAPL", bars.iloc[:-20])
+        first.save("AAPL")
+        resumed = IncrementalFeatureEngine(state_dir).extend("AAPL", bars)
+    tail = (resumed[FEATURE_COLS] - inc[FEATURE_COLS].iloc[-len(resumed):]).abs().max().max()
+    print(f"resumed from snapshot: {len(resumed)} new rows, max difference {tail:.2e}")
@@ -0,0 +1,326 @@
+# market_data_db.py
+import io
+import time
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from data.feature_registry import FEATURE_COLS
+
+# Column order and SQL types of public.market_data
+MARKET_DATA_SCHEMA = [
+    ("Date", "DATE"),
+    ("Close", "FLOAT"),
+    ("High", "FLOAT"),
+    ("Low", "FLOAT"),
+    ("Open", "FLOAT"),
+    ("Volume", "BIGINT"),
+    *[(name, "FLOAT") for name in FEATURE_COLS],
+    ("Symbol", "TEXT"),
+]
+MARKET_DATA_COLUMNS = [name for name, _ in MARKET_DATA_SCHEMA]
+
+STAGING_TABLE = "market_data_staging"
+LATEST_VIEW = "public.market_data_latest"
+
+
+def create_table_sql(table="public.market_data", partitioned=False):
+    """
+    CREATE TABLE IF NOT EXISTS statement for the market data table.
+    partitioned=True declares it PARTITION BY RANGE ("Date") (PostgreSQL); add the yearly
+    partitions with create_partitions_sql().
+    """
+    cols = ",\n        ".join(f'"{name}" {sql_type}' for name, sql_type in MARKET_DATA_SCHEMA)
+    partition = ' PARTITION BY RANGE ("Date")' if partitioned else ""
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        {cols},
+        PRIMARY KEY ("Date", "Symbol")
+    ){partition};
+    """
+
+
+def create_partitions_sql(table="public.market_data", years=()):
+    """
+    One partition per calendar year plus a DEFAULT partition for anything outside `years`.
+    """
+    stmts = [
+        f"CREATE TABLE IF NOT EXISTS {table}_{y} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{y}-01-01') TO ('{y + 1}-01-01')"
+        for y in years
+    ]
+    stmts.append(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+    return stmts
+
+
+def _index_sql(dialect, table, suffix, columns, unique=False):
+    # PostgreSQL indexes live in the table's schema; SQLite wants the schema on the index name
+    schema, _, name = table.rpartition(".")
+    cols = ", ".join(f'"{c}"' for c in columns)
+    unique = "UNIQUE " if unique else ""
+    if dialect == "postgresql" or not schema:
+        return f"CREATE {unique}INDEX IF NOT EXISTS {name}_{suffix} ON {table} ({cols})"
+    return f"CREATE {unique}INDEX IF NOT EXISTS {schema}.{name}_{suffix} ON {name} ({cols})"
+
+
+def create_indexes_sql(dialect, table="public.market_data"):
+    """
+    Supporting indexes: the primary key covers (Date, Symbol) lookups such as "who has a bar
+    on day X"; ("Symbol", "Date") serves per-symbol range scans and the latest-row view.
+    """
+    return [_index_sql(dialect, table, "symbol_date_idx", ["Symbol", "Date"])]
+
+
+def create_latest_view_sql(dialect, table="public.market_data", view=LATEST_VIEW):
+    """
+    The latest row of every symbol. On PostgreSQL a materialized view (with the unique index
+    REFRESH ... CONCURRENTLY needs); elsewhere a plain table rebuilt by refresh_latest_view().
+    """
+    if dialect == "postgresql":
+        return [
+            f'CREATE MATERIALIZED VIEW IF NOT EXISTS {view} AS '
+            f'SELECT DISTINCT ON ("Symbol") * FROM {table} ORDER BY "Symbol", "Date" DESC',
+            _index_sql(dialect, view, "symbol_idx", ["Symbol"], unique=True),
+        ]
+    return [
+        f"CREATE TABLE IF NOT EXISTS {view} AS SELECT * FROM {table} WHERE 0 = 1",
+        _index_sql(dialect, view, "symbol_idx", ["Symbol"], unique=True),
+    ]
+
+
+def ensure_market_data_schema(engine, table="public.market_data", partitioned=False, years=()):
+    """
+    Create the table (optionally partitioned by year), its indexes and the latest-row view.
+    Partitioning only applies on PostgreSQL and only when the table is first created.
+    """
+    dialect = engine.dialect.name
+    partitioned = partitioned and dialect == "postgresql"
+    stmts = [create_table_sql(table, partitioned)]
+    if partitioned:
+        stmts += create_partitions_sql(table, years)
+    stmts += create_indexes_sql(dialect, table)
+    stmts += create_latest_view_sql(dialect, table)
+    with engine.begin() as conn:
+        for stmt in stmts:
+            conn.exec_driver_sql(stmt)
+
+
+def refresh_latest_view(engine, table="public.market_data", view=LATEST_VIEW):
+    """
+    Bring the latest-row view up to date after an ingest.
+    """
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+        else:
+            conn.exec_driver_sql(f"DELETE FROM {view}")
+            conn.exec_driver_sql(
+                f'INSERT INTO {view} SELECT t.* FROM {table} t JOIN '
+                f'(SELECT "Symbol", MAX("Date") AS "Date" FROM {table} GROUP BY "Symbol") m '
+                f'ON t."Symbol" = m."Symbol" AND t."Date" = m."Date"'
+            )
+
+
+def build_feature_query(columns, table="public.market_data", symbols=None, start=None, end=None,
+                        require_date=None):
+    """
+    SELECT of Date/Symbol + columns ordered by Symbol, Date with every filter in the WHERE clause.
+
+    symbols: only these symbols. start / end: Date range [start, end).
+    require_date: only symbols that have a row on this date (e.g. yesterday) -- answered from
+        the (Date, Symbol) primary key instead of loading everything and merging in pandas.
+    Returns (query, params) for pd.read_sql / db.stream_query.
+    """
+    cols = ", ".join(f'"{c}"' for c in ["Date", "Symbol"] + [c for c in columns if c not in ("Date", "Symbol")])
+    where = ['"Date" IS NOT NULL', '"Symbol" IS NOT NULL']
+    params = {}
+    if symbols is not None:
+        where.append('"Symbol" IN :symbols')
+        params["symbols"] = list(symbols)
+    if start is not None:
+        where.append('"Date" >= :start')
+        params["start"] = pd.Timestamp(start).strftime("%Y-%m-%d")
+    if end is not None:
+        where.append('"Date" < :end')
+        params["end"] = pd.Timestamp(end).strftime("%Y-%m-%d")
+    if require_date is not None:
+        where.append(f'"Symbol" IN (SELECT "Symbol" FROM {table} WHERE "Date" = :require_date)')
+        params["require_date"] = pd.Timestamp(require_date).strftime("%Y-%m-%d")
+
+    q = text(f'SELECT {cols} FROM {table} WHERE {" AND ".join(where)} ORDER BY "Symbol", "Date"')
+    if symbols is not None:
+        q = q.bindparams(bindparam("symbols", expanding=True))
+    return q, params
+
+
+def load_latest_rows(engine, columns=None, view=LATEST_VIEW, as_of=None):
+    """
+    Latest stored row per symbol from the view (~one row per symbol instead of the full table).
+    as_of: only symbols whose latest row is on this date.
+    """
+    cols = "*" if columns is None else ", ".join(
+        f'"{c}"' for c in ["Date", "Symbol"] + [c for c in columns if c not in ("Date", "Symbol")])
+    q = f'SELECT {cols} FROM {view}'
+    params = {}
+    if as_of is not None:
+        q += ' WHERE "Date" = :as_of'
+        params["as_of"] = pd.Timestamp(as_of).strftime("%Y-%m-%d")
+    df = pd.read_sql(text(q + ' ORDER BY "Symbol"'), engine, params=params)
+    df["Date"] = pd.to_datetime(df["Date"])
+    return df
+
+
+def get_watermarks(engine, table="public.market_data"):
+    """
+    Latest stored Date per symbol, in one query: {symbol: Timestamp}.
+    """
+    q = f'SELECT "Symbol", MAX("Date") AS "Date" FROM {table} GROUP BY "Symbol"'
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(q).fetchall()
+    return {symbol: pd.Timestamp(date) for symbol, date in rows if date is not None}
+
+
+def get_row_counts(engine, table="public.market_data"):
+    """
+    Stored rows per symbol, in one query: {symbol: rows}.
+    """
+    q = f'SELECT "Symbol", COUNT(*) FROM {table} GROUP BY "Symbol"'
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(q).fetchall()
+    return {symbol: int(n) for symbol, n in rows}
+
+
+def get_date_range(engine, table="public.market_data"):
+    """
+    (first, last) stored Date, in one query; (None, None) for an empty table.
+    """
+    q = f'SELECT MIN("Date"), MAX("Date") FROM {table}'
+    with engine.connect() as conn:
+        first, last = conn.exec_driver_sql(q).fetchone()
+    if first is None:
+        return None, None
+    return pd.Timestamp(first), pd.Timestamp(last)
+
+
+def plan_incremental_fetch(symbols, watermarks, start, end, lookback):
+    """
+    Work out the download window for each symbol from its watermark.
+
+    Symbols with no stored rows start at `start`. Symbols whose watermark already reaches the
+    last business day before `end` are up to date. Everything else starts `lookback` bars
+    (plus a holiday margin) before its watermark, so rolling features of the new rows are
+    computed over a full window.
+
+    Returns ({symbol: fetch_start}, [up_to_date symbols]).
+    """
+    start = pd.Timestamp(start)
+    last_bar = (pd.Timestamp(end) - pd.offsets.BDay(1)).normalize()
+    warmup = pd.offsets.BDay(lookback + 15)  # ~10 exchange holidays a year on top of weekends
+
+    starts, up_to_date = {}, []
+    for symbol in symbols:
+        wm = watermarks.get(symbol)
+        if wm is None:
+            starts[symbol] = start.strftime("%Y-%m-%d")
+        elif wm >= last_bar:
+            up_to_date.append(symbol)
+        else:
+            starts[symbol] = max(start, wm - warmup).strftime("%Y-%m-%d")
+    return starts, up_to_date
+
+
+def _prepare(df):
+    """
+    Select the table's columns in order, with types COPY accepts.
+    """
+    df = df[MARKET_DATA_COLUMNS].copy()
+    df["Date"] = pd.to_datetime(df["Date"]).dt.strftime("%Y-%m-%d")
+    df["Volume"] = df["Volume"].round().astype("Int64")
+    return df.drop_duplicates(subset=["Date", "Symbol"], keep="last")
+
+
+def bulk_upsert_market_data(engine, df, table="public.market_data", chunk_rows=200_000):
+    """
+    Insert every new (Date, Symbol) row of df into the market data table in one transaction.
+
+    On PostgreSQL the rows are streamed with COPY into a temporary staging table and merged
+    with a single INSERT ... ON CONFLICT ("Date","Symbol") DO NOTHING, so a full universe
+    refresh costs a handful of round trips instead of a SELECT + INSERT per symbol.
+    Other dialects (e.g. SQLite as a local stand-in) fill the staging table with executemany.
+
+    Returns the number of rows actually inserted.
+    """
+    if df.empty:
+        return 0
+    df = _prepare(df)
+    cols = ", ".join(f'"{c}"' for c in MARKET_DATA_COLUMNS)
+    is_pg = engine.dialect.name == "postgresql"
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        if is_pg:
+            cur.execute(f"CREATE TEMP TABLE {STAGING_TABLE} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+            for i in range(0, len(df), chunk_rows):
+                buf = io.StringIO()
+                df.iloc[i:i + chunk_rows].to_csv(buf, index=False, header=False)
+                buf.seek(0)
+                cur.copy_expert(f"COPY {STAGING_TABLE} ({cols}) FROM STDIN WITH (FORMAT csv)", buf)
+        else:
+            cur.execute(f"CREATE TEMP TABLE {STAGING_TABLE} AS SELECT {cols} FROM {table} WHERE 0 = 1")
+            marker = "?" if engine.dialect.paramstyle == "qmark" else "%s"
+            insert = f"INSERT INTO {STAGING_TABLE} ({cols}) VALUES ({', '.join([marker] * len(MARKET_DATA_COLUMNS))})"
+            records = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+            cur.executemany(insert, list(records))
+
+        # WHERE true keeps SQLite from parsing ON CONFLICT as part of the SELECT
+        cur.execute(
+            f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {STAGING_TABLE} WHERE true "
+            f'ON CONFLICT ("Date", "Symbol") DO NOTHING'
+        )
+        inserted = cur.rowcount
+        if not is_pg:
+            cur.execute(f"DROP TABLE {STAGING_TABLE}")
+        raw.commit()
+        cur.close()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+    return inserted
+
+
+if __name__ == "__main__":
+    # Offline benchmark against SQLite: per-symbol SELECT + to_sql vs one staged upsert
+    from sqlalchemy import create_engine, text
+    from data.bulk_download import FakeDataSource
+    from data.feature_engineering import compute_return_features
+
+    source = FakeDataSource(latency=0)
+    parts = []
+    for i in range(20):
+        symbol = f"SYM{i:03d}"
+        df = compute_return_features(source.get_historical_data(symbol, "2018-01-01", "2025-01-01"))
+        df["Symbol"] = symbol
+        parts.append(df.reset_index())
+    frame = pd.concat(parts, ignore_index=True)
+
+    for label in ["per-symbol to_sql", "staged upsert"]:
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            conn.execute(text(create_table_sql("market_data")))
+        t0 = time.perf_counter()
+        if label == "staged upsert":
+            n = bulk_upsert_market_data(engine, frame, table="market_data")
+        else:
+            n = 0
+            for symbol, g in frame.groupby("Symbol"):
+                g = _prepare(g)
+                with engine.begin() as conn:
+                    existing = pd.read_sql(text('SELECT "Date" FROM market_data WHERE "Symbol" = :s'),
+                                           conn, params={"s": symbol})
+                    g = g[~g["Date"].isin(existing["Date"])]
+                    g.to_sql("market_data", conn, if_exists="append", index=False, method="multi", chunksize=500)
+                    n += len(g)
+        print(f"{label:>18}: {n} rows in {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,150 @@
+# panel_features.py
+import numpy as np
+import pandas as pd
+from data.feature_registry import MAX_LOOKBACK, evaluate
+from data.market_data_db import MARKET_DATA_COLUMNS
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def panel_from_frames(frames):
+    """
+    Align {symbol: OHLCV frame indexed by Date} into wide date x symbol arrays.
+    Returns (dates, symbols, {field: 2-D float array}); missing bars are NaN.
+    """
+    symbols = sorted(frames)
+    if not symbols:
+        return pd.DatetimeIndex([]), symbols, {f: np.empty((0, 0)) for f in OHLCV}
+    dates = pd.DatetimeIndex(np.unique(np.concatenate([frames[s].index.values for s in symbols])))
+    fields = {f: np.full((len(dates), len(symbols)), np.nan) for f in OHLCV}
+    for j, s in enumerate(symbols):
+        rows = dates.searchsorted(frames[s].index.values)
+        for field in OHLCV:
+            fields[field][rows, j] = frames[s][field].to_numpy(dtype=np.float64)
+    return dates, symbols, fields
+
+
+def compute_panel_features(dates, symbols, fields):
+    """
+    Compute every feature of data.feature_registry for all symbols at once.
+
+    fields maps Open/High/Low/Close/Volume to date x symbol arrays (NaN where a symbol has no
+    bar). Each column is first packed so its bars are contiguous from row 0 -- the windows
+    then see exactly the bars a per-symbol compute_return_features call would see, even
+    across IPO dates and trading halts. Returns a long frame with the public.market_data
+    columns, keeping only rows where every feature is defined (the batch dropna()).
+    """
+    close_raw = fields["Close"]
+    valid = ~np.isnan(close_raw)
+    order = np.argsort(~valid, axis=0, kind="stable")  # each column's bars first, in date order
+    n_bars = valid.sum(axis=0)
+    o, h, l, c, v = (np.take_along_axis(fields[f], order, axis=0) for f in OHLCV)
+
+    # The registry's definitions work column-wise, so they run on the whole panel at once.
+    # Rows past a column's last bar are masked out below; filling their Close keeps
+    # pct_change from having to pad gaps. Close is never NaN inside a column's bars, so
+    # the fill only reaches those rows. Open/High/Low/Volume are left as they are: a bar
+    # missing one of them must feed NaN into the windows just as it does per symbol.
+    raw = dict(zip(OHLCV, map(pd.DataFrame, (o, h, l, c, v))))
+    raw["Close"] = raw["Close"].ffill()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        feats = {name: values.to_numpy(dtype=np.float64) for name, values in evaluate(raw).items()}
+
+    keep = np.arange(len(c))[:, None] < n_bars[None, :]
+    keep[:MAX_LOOKBACK] = False
+    for arr in (o, h, l, v, *feats.values()):  # the per-symbol dropna() covers raw bars too
+        keep &= ~np.isnan(arr)
+
+    # Symbol-major row order, dates ascending within each symbol
+    mask = keep.T
+    cols_idx = np.nonzero(mask)[0]
+    out = {
+        "Date": dates.values[order.T[mask]],
+        "Close": c.T[mask],
+        "High": h.T[mask],
+        "Low": l.T[mask],
+        "Open": o.T[mask],
+        "Volume": v.T[mask],
+    }
+    for name, arr in feats.items():
+        out[name] = arr.T[mask]
+    out["Symbol"] = np.asarray(symbols, dtype=object)[cols_idx]
+    return pd.DataFrame(out)[MARKET_DATA_COLUMNS]
+
+
+def _validated(df):
+    """
+    Check one symbol's frame before it joins the panel: OHLCV present and numeric on a
+    unique DatetimeIndex. Raises ValueError otherwise.
+    """
+    missing = [f for f in OHLCV if f not in df.columns]
+    if missing:
+        raise ValueError(f"missing columns {', '.join(missing)}")
+    bad = [f for f in OHLCV if not pd.api.types.is_numeric_dtype(df[f])]
+    if bad:
+        raise ValueError(f"non-numeric columns {', '.join(bad)}")
+    if not isinstance(df.index, pd.DatetimeIndex):
+        raise ValueError("index is not a DatetimeIndex")
+    if not df.index.is_unique:
+        raise ValueError(f"{df.index.duplicated().sum()} duplicate dates")
+    return df
+
+
+def compute_features_for_frames(frames):
+    """
+    Panel replacement for calling compute_return_features once per downloaded symbol.
+    A malformed frame (missing columns, non-numeric values, duplicate dates) is skipped with a
+    warning instead of failing the rest of the chunk.
+    """
+    valid = {}
+    for symbol, df in frames.items():
+        try:
+            valid[symbol] = _validated(df)
+        except Exception as e:
+            print(f"[WARNING] Failed to compute features for {symbol}: {e}")
+    if not valid:
+        return pd.DataFrame(columns=MARKET_DATA_COLUMNS)
+    return compute_panel_features(*panel_from_frames(valid))
+
+
+if __name__ == "__main__":
+    # Compare against the per-symbol pandas path on synthetic bars
+    import time
+    from data.bulk_download import FakeDataSource
+    from data.feature_engineering import compute_return_features
+
+    source = FakeDataSource(latency=0)
+    frames = {f"SYM{i:03d}": source.get_historical_data(f"SYM{i:03d}", "2015-01-01", "2025-01-01")
+              for i in range(500)}
+    frames["SYM001"] = frames["SYM001"].iloc[800:]            # late listing
+    frames["SYM002"] = frames["SYM002"].drop(frames["SYM002"].index[1500:1510])  # halt
+    frames["SYM006"] = frames["SYM006"].copy()                # partially missing bars
+    frames["SYM006"].iloc[1200, frames["SYM006"].columns.get_loc("High")] = np.nan
+    frames["SYM006"].iloc[1300, frames["SYM006"].columns.get_loc("Open")] = np.nan
+    frames["SYM006"].iloc[1400, frames["SYM006"].columns.get_loc("Volume")] = np.nan
+
+    t0 = time.perf_counter()
+    parts = []
+    for s, df in frames.items():
+        df = compute_return_features(df.copy())
+        df["Symbol"] = s
+        parts.append(df.reset_index()[MARKET_DATA_COLUMNS])
+    per_symbol = pd.concat(parts, ignore_index=True)
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    panel = compute_features_for_frames(frames)
+    t_panel = time.perf_counter() - t0
+
+    feats = MARKET_DATA_COLUMNS[6:-1]
+    diff = (panel[feats] - per_symbol[feats]).abs() / (per_symbol[feats].abs() + 1e-12)
+    print(f"rows: panel {len(panel)} / per-symbol {len(per_symbol)}")
+    print(f"max relative difference: {diff.max().max():.2e}")
+    assert len(panel) == len(per_symbol) and (panel["Date"] == per_symbol["Date"]).all()
+    assert diff.max().max() < 1e-9
+    print(f"per-symbol: {t_loop:.2f}s | panel: {t_panel:.2f}s")
+
+    # Malformed frames are skipped without losing the rest of the chunk
+    bad = {"DUP": pd.concat([frames["SYM003"], frames["SYM003"].iloc[-5:]]),
+           "TXT": frames["SYM004"].assign(Close="n/a"), "SYM005": frames["SYM005"]}
+    print(f"with malformed frames: {compute_features_for_frames(bad)['Symbol'].unique().tolist()}")
@@ -0,0 +1,147 @@
+# universe.py
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+
+WIKI_SP500_URL = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+
+
+def _normalize(symbols):
+    # Yahoo uses '-' where Wikipedia uses '.', e.g. BRK.B -> BRK-B
+    return symbols.astype(str).str.strip().str.replace(".", "-", regex=False)
+
+
+def scrape_sp500():
+    """
+    Scrape current S&P 500 members and the historical changes table from Wikipedia.
+    Returns (members list, changes DataFrame[Date, Added, Removed]).
+    """
+    tables = pd.read_html(WIKI_SP500_URL)
+    members = _normalize(tables[0]["Symbol"]).unique().tolist()
+
+    changes = pd.DataFrame(columns=["Date", "Added", "Removed"])
+    if len(tables) > 1:
+        raw = tables[1]
+        cols = {}
+        for col in raw.columns:
+            top, sub = (col if isinstance(col, tuple) else (col, col))[:2]
+            if "date" in str(top).lower():
+                cols["Date"] = col
+            elif str(top).startswith("Added") and str(sub).startswith("Ticker"):
+                cols["Added"] = col
+            elif str(top).startswith("Removed") and str(sub).startswith("Ticker"):
+                cols["Removed"] = col
+        if len(cols) == 3:
+            changes = pd.DataFrame({
+                "Date": pd.to_datetime(raw[cols["Date"]], errors="coerce", format="mixed"),
+                "Added": _normalize(raw[cols["Added"]].fillna("")),
+                "Removed": _normalize(raw[cols["Removed"]].fillna("")),
+            }).dropna(subset=["Date"])
+    return members, changes
+
+
+class UniverseStore:
+    """
+    Local store of dated S&P 500 membership snapshots.
+
+        {root}/sp500_{YYYY-MM-DD}.csv   members on that day
+        {root}/sp500_changes.csv        Wikipedia's additions/removals log
+
+    current() re-scrapes only when the newest snapshot is older than ttl_hours and falls back
+    to the newest snapshot when Wikipedia is unreachable. members_as_of() answers
+    point-in-time questions from disk alone by replaying the changes log from the nearest
+    snapshot.
+    """
+    def __init__(self, root="cache/universe", ttl_hours=24, scrape_fn=scrape_sp500):
+        self.root = root
+        self.ttl_hours = ttl_hours
+        self.scrape_fn = scrape_fn
+
+    def _snapshot_path(self, day):
+        return os.path.join(self.root, f"sp500_{day}.csv")
+
+    def _changes_path(self):
+        return os.path.join(self.root, "sp500_changes.csv")
+
+    def snapshots(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(f[len("sp500_"):-4] for f in os.listdir(self.root)
+                      if f.startswith("sp500_") and f.endswith(".csv") and f != "sp500_changes.csv")
+
+    def _read_snapshot(self, day):
+        return pd.read_csv(self._snapshot_path(day))["Symbol"].tolist()
+
+    def _read_changes(self):
+        path = self._changes_path()
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=["Date", "Added", "Removed"])
+        changes = pd.read_csv(path, keep_default_na=False)
+        changes["Date"] = pd.to_datetime(changes["Date"])
+        return changes
+
+    def refresh(self):
+        """
+        Scrape Wikipedia and store today's snapshot plus the changes log.
+        """
+        members, changes = self.scrape_fn()
+        os.makedirs(self.root, exist_ok=True)
+        day = datetime.now().strftime("%Y-%m-%d")
+        pd.DataFrame({"Symbol": members}).to_csv(self._snapshot_path(day), index=False)
+        if not changes.empty:
+            changes.to_csv(self._changes_path(), index=False, date_format="%Y-%m-%d")
+        print(f"[INFO] Stored S&P 500 snapshot {day} ({len(members)} members)")
+        return members
+
+    def current(self, offline=False, force_refresh=False):
+        """
+        Current members: cached snapshot if younger than the TTL, otherwise a fresh scrape,
+        otherwise (offline or scrape failed) the newest snapshot on disk.
+        """
+        names = self.snapshots()
+        if names and not force_refresh:
+            age_hours = (time.time() - os.path.getmtime(self._snapshot_path(names[-1]))) / 3600
+            if offline or age_hours < self.ttl_hours:
+                return self._read_snapshot(names[-1])
+        if not offline:
+            try:
+                return self.refresh()
+            except Exception as e:
+                if not names:
+                    raise
+                print(f"[WARNING] S&P 500 refresh failed ({e}); using snapshot {names[-1]}")
+        if not names:
+            raise FileNotFoundError(f"[ERROR] No S&P 500 snapshot in {self.root} and offline mode is on.")
+        return self._read_snapshot(names[-1])
+
+    def members_as_of(self, date):
+        """
+        Point-in-time membership on `date` without network access.
+        Starts from the latest snapshot on or before `date` and rolls the changes log forward;
+        if every snapshot is newer, starts from the oldest one and rolls changes backwards.
+        """
+        date = pd.Timestamp(date).normalize()
+        names = self.snapshots()
+        if not names:
+            raise FileNotFoundError(f"[ERROR] No S&P 500 snapshot in {self.root}. Call refresh() first.")
+        changes = self._read_changes()
+
+        before = [n for n in names if pd.Timestamp(n) <= date]
+        if before:
+            snap = before[-1]
+            members = set(self._read_snapshot(snap))
+            window = changes[(changes["Date"] > pd.Timestamp(snap)) & (changes["Date"] <= date)]
+            for _, row in window.sort_values("Date").iterrows():
+                members.discard(row["Removed"])
+                members.add(row["Added"])
+        else:
+            snap = names[0]
+            members = set(self._read_snapshot(snap))
+            window = changes[(changes["Date"] > date) & (changes["Date"] <= pd.Timestamp(snap))]
+            for _, row in window.sort_values("Date", ascending=False).iterrows():
+                members.discard(row["Added"])
+                members.add(row["Removed"])
+        members.discard("")
+        return sorted(members)
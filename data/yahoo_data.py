@@ -2,19 +2,59 @@ import yfinance as yf
 import pandas as pd
 import numpy as np
 
-def get_sp500_symbols():
-    # Get symbols for smp500 companies
-    smp500 = pd.read_html("https://en.wikipedia.org/wiki/List_of_S%26P_500_companies")[0]
-    smp500["Symbol"] = smp500["Symbol"].str.replace(".", "-")
-    symbol_list = smp500["Symbol"].unique().tolist()
-    return symbol_list
+def get_sp500_symbols(as_of=None, offline=False, ttl_hours=24, root="cache/universe"):
+    """
+    Get symbols for smp500 companies from the local universe store.
+    Wikipedia is only scraped when the cached snapshot is older than ttl_hours; if it is
+    unreachable (or offline=True) the newest snapshot on disk is used.
+    as_of="YYYY-MM-DD" returns point-in-time membership for that day without network access.
+    """
+    from data.universe import UniverseStore
+    store = UniverseStore(root=root, ttl_hours=ttl_hours)
+    if as_of is not None:
+        return store.members_as_of(as_of)
+    return store.current(offline=offline)
 
 
-def get_historical_data(symbol, start="2022-01-01", end="2025-01-01", interval="1d", auto_adjust=False):
-    df = yf.download(symbol, start=start, end=end, interval=interval)
+def get_historical_data(symbol, start="2022-01-01", end="2025-01-01", interval="1d", auto_adjust=False, cache=None):
+    """
+    Download OHLCV bars for one symbol.
+    Pass a data.bar_cache.BarCache as cache to serve what is already on disk and only fetch the gaps.
+    """
+    if cache is not None:
+        return cache.get_historical_data(symbol, start=start, end=end, interval=interval, auto_adjust=auto_adjust)
+    df = yf.download(symbol, start=start, end=end, interval=interval, auto_adjust=auto_adjust)
     df.dropna(inplace=True)
     return df
 
+
+def get_historical_data_batch(symbols, start="2022-01-01", end="2025-01-01", interval="1d", auto_adjust=False):
+    """
+    Download many symbols in a single yfinance request.
+    Returns {symbol: DataFrame}; symbols yfinance returned nothing for are left out.
+    """
+    df = yf.download(
+        list(symbols), start=start, end=end, interval=interval,
+        auto_adjust=auto_adjust, group_by="ticker", threads=False, progress=False,
+    )
+    frames = {}
+    if df is None or df.empty:
+        return frames
+
+    if not isinstance(df.columns, pd.MultiIndex):
+        # A single-ticker request comes back with flat columns
+        frames[symbols[0]] = df.dropna()
+        return frames
+
+    tickers = set(df.columns.get_level_values(0))
+    for symbol in symbols:
+        if symbol not in tickers:
+            continue
+        sub = df[symbol].dropna()
+        if not sub.empty:
+            frames[symbol] = sub
+    return frames
+
 # Example
 if __name__ == "__main__":
     df = get_historical_data("AAPL", "2023-01-01", "2025-01-01")
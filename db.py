@@ -0,0 +1,88 @@
+# db.py
+import os
+
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+load_dotenv()
+
+# One pooled engine per URL, shared by ingest, training, evaluation and trading
+_engines = {}
+
+
+def database_url():
+    """
+    DATABASE_URL, or a postgresql:// URL built from the POSTGRES_* variables.
+    """
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return url
+    if not os.getenv("POSTGRES_DB"):
+        raise RuntimeError("DATABASE_URL env var is not set.")
+    return "postgresql://{user}:{password}@{host}:{port}/{db}".format(
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        host=os.getenv("POSTGRES_HOST", "localhost"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        db=os.getenv("POSTGRES_DB"),
+    )
+
+
+def get_engine(url=None):
+    """
+    Shared SQLAlchemy engine (connection pool) for url (default: database_url()).
+    Pool size is set with DB_POOL_SIZE / DB_MAX_OVERFLOW; connections are checked before use
+    and recycled after 30 minutes so long-running jobs survive server-side timeouts.
+    """
+    url = url or database_url()
+    if url not in _engines:
+        kwargs = {"pool_pre_ping": True}
+        if not url.startswith("sqlite"):
+            kwargs.update(
+                pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+                max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+                pool_recycle=1800,
+            )
+        _engines[url] = create_engine(url, **kwargs)
+    return _engines[url]
+
+
+def dispose_engines():
+    """
+    Close every pooled connection (e.g. after forking worker processes).
+    """
+    for engine in _engines.values():
+        engine.dispose()
+    _engines.clear()
+
+
+def stream_query(sql, params=None, chunk_rows=50_000, engine=None):
+    """
+    Run sql and yield the result as DataFrames of up to chunk_rows rows.
+    On PostgreSQL this uses a server-side (named) cursor, so only one chunk is held in
+    memory at a time instead of the whole result set.
+    """
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows)
+        for chunk in pd.read_sql(sql, conn, params=params, chunksize=chunk_rows):
+            yield chunk
+
+
+def iter_symbol_groups(sql, params=None, chunk_rows=50_000, engine=None):
+    """
+    Stream a query ordered by "Symbol" and yield (symbol, DataFrame) one complete symbol at a time.
+    A symbol split across two chunks is held back until its last row has arrived.
+    """
+    pending = None
+    for chunk in stream_query(sql, params, chunk_rows, engine):
+        if pending is not None:
+            chunk = pd.concat([pending, chunk], ignore_index=True)
+        last = chunk["Symbol"].iloc[-1]
+        done = chunk["Symbol"] != last
+        for symbol, group in chunk[done].groupby("Symbol", sort=False):
+            yield symbol, group.reset_index(drop=True)
+        pending = chunk[~done]
+    if pending is not None and not pending.empty:
+        yield pending["Symbol"].iloc[0], pending.reset_index(drop=True)
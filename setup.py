@@ -24,7 +24,8 @@ setup(
         "lxml==4.9.3",
         "xgboost==2.0.3",
         "joblib==1.4.2",
-        "python-dotenv==1.0.1"
+        "python-dotenv==1.0.1",
+        "pyarrow==16.1.0"
     ],
     entry_points={
         "console_scripts": [
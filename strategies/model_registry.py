@@ -0,0 +1,202 @@
+# model_registry.py
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import joblib
+import pandas as pd
+import xgboost as xgb
+
+
+def data_hash(X, y=None):
+    """
+    Short content hash of the training data, stored in the model metadata so later runs can
+    tell whether a symbol's data changed since its model was fitted.
+    """
+    h = hashlib.sha1()
+    h.update(json.dumps(list(map(str, X.columns))).encode())
+    h.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+    if y is not None:
+        h.update(pd.util.hash_pandas_object(y, index=False).values.tobytes())
+    return h.hexdigest()[:20]
+
+
+class ModelRegistry:
+    """
+    Per-symbol models on disk plus an in-process LRU cache.
+
+    Models are stored in XGBoost's native binary format with a JSON sidecar:
+        {root}/{horizon}/model_{symbol}.ubj
+        {root}/{horizon}/model_{symbol}.meta.json   (horizon, features, train range, data hash, ...)
+    Legacy model_{symbol}.joblib pickles are still loaded when no .ubj file exists.
+    Names starting with "_" are reserved for models that are not per-symbol (the pooled
+    model is stored as "_pooled") and are left out of list_symbols().
+
+    load() is lazy and keeps up to cache_size models in memory; a cached model is reloaded
+    if its file changed on disk (e.g. a scheduler retrained it).
+    """
+    def __init__(self, root="models", cache_size=128):
+        self.root = root
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ----------------------------
+    # Paths
+    # ----------------------------
+    def model_path(self, symbol, horizon=1):
+        return os.path.join(self.root, str(horizon), f"model_{symbol}.ubj")
+
+    def meta_path(self, symbol, horizon=1):
+        return os.path.join(self.root, str(horizon), f"model_{symbol}.meta.json")
+
+    def legacy_path(self, symbol, horizon=1):
+        return os.path.join(self.root, str(horizon), f"model_{symbol}.joblib")
+
+    def resolve_path(self, symbol, horizon=1):
+        """
+        Path of the stored model (native first, then legacy pickle), or None.
+        """
+        for path in (self.model_path(symbol, horizon), self.legacy_path(symbol, horizon)):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def params_path(self, horizon=1):
+        return os.path.join(self.root, str(horizon), "best_params.json")
+
+    def compiled_path(self, horizon=1):
+        return os.path.join(self.root, str(horizon), "compiled_trees.npz")
+
+    def exists(self, symbol, horizon=1):
+        return self.resolve_path(symbol, horizon) is not None
+
+    def list_symbols(self, horizon=1):
+        """
+        Sorted symbols with a stored per-symbol model for a horizon (reserved "_" names excluded).
+        """
+        folder = os.path.join(self.root, str(horizon))
+        if not os.path.isdir(folder):
+            return []
+        return sorted({f[len("model_"):].split(".")[0] for f in os.listdir(folder)
+                       if f.startswith("model_") and f.endswith((".ubj", ".joblib"))
+                       and not f.startswith("model__")})
+
+    # ----------------------------
+    # Save / load
+    # ----------------------------
+    def save(self, model, symbol, horizon=1, features=None, train_start=None, train_end=None,
+             data_hash=None, **extra):
+        """
+        Write model (XGBRegressor) in native .ubj format with its metadata. Returns the model path.
+        """
+        path = self.model_path(symbol, horizon)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp.ubj"
+        model.save_model(tmp)
+        os.replace(tmp, path)
+
+        meta = {
+            "symbol": symbol,
+            "horizon": horizon,
+            "features": list(features) if features is not None else model.get_booster().feature_names,
+            "train_start": str(train_start) if train_start is not None else None,
+            "train_end": str(train_end) if train_end is not None else None,
+            "data_hash": data_hash,
+            "xgboost": xgb.__version__,
+            "saved": datetime.now().isoformat(timespec="seconds"),
+            **extra,
+        }
+        tmp = self.meta_path(symbol, horizon) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp, self.meta_path(symbol, horizon))
+
+        with self._lock:
+            self._cache.pop((horizon, symbol), None)
+        return path
+
+    def meta(self, symbol, horizon=1):
+        """
+        Metadata dict written by save(), or None for legacy / missing models.
+        """
+        path = self.meta_path(symbol, horizon)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def load(self, symbol, horizon=1):
+        """
+        The symbol's model, from the cache when its file is unchanged. Raises FileNotFoundError.
+        """
+        path = self.resolve_path(symbol, horizon)
+        if path is None:
+            raise FileNotFoundError(f"[MISSING] Model not found for {symbol}")
+        key = (horizon, symbol)
+        mtime = os.path.getmtime(path)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == path and entry[1] == mtime:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        if path.endswith(".ubj"):
+            model = xgb.XGBRegressor()
+            model.load_model(path)
+        else:
+            model = joblib.load(path)
+
+        with self._lock:
+            self._cache[key] = (path, mtime, model)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return model
+
+    def save_best_params(self, config, horizon=1):
+        """
+        Write the tuned configuration of a horizon (see strategies.tuning.tune). Returns its path.
+        """
+        path = self.params_path(horizon)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(config, f, indent=2, default=str)
+        os.replace(tmp, path)
+        return path
+
+    def best_params(self, horizon=1):
+        """
+        Tuned configuration of a horizon ({"params": {...}, "n_estimators": ..., ...}), or None.
+        """
+        path = self.params_path(horizon)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_registries = {}
+
+
+def get_registry(root="models", cache_size=128):
+    """
+    Process-wide registry for root, so long-running processes (scheduler, dashboard) reuse
+    the same cache across calls.
+    """
+    if root not in _registries:
+        _registries[root] = ModelRegistry(root, cache_size)
+    return _registries[root]
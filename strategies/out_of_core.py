@@ -0,0 +1,152 @@
+# out_of_core.py
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from strategies.pooled_model import _prepare_pooled, save_pooled_model, symbol_codes
+
+
+class ChunkIter(xgb.DataIter):
+    """
+    Feeds XGBoost one chunk at a time: load(i) returns (X, y) for chunk i, or None to skip it.
+    Only the current chunk is held in memory; XGBoost calls reset() and iterates again
+    for every pass it needs over the data.
+    cache_prefix: directory/prefix for external-memory pages (DMatrix), None for QuantileDMatrix.
+    """
+    def __init__(self, n_chunks, load, cache_prefix=None):
+        self._n_chunks = n_chunks
+        self._load = load
+        self._i = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        while self._i < self._n_chunks:
+            chunk = self._load(self._i)
+            self._i += 1
+            if chunk is not None and len(chunk[0]):
+                input_data(data=chunk[0], label=chunk[1])
+                return 1
+        return 0
+
+    def reset(self):
+        self._i = 0
+
+
+def date_windows(first, last, days=365):
+    """
+    Consecutive [start, end) Date windows of `days` calendar days covering first..last.
+    """
+    first, last = pd.Timestamp(first).normalize(), pd.Timestamp(last).normalize()
+    edges = list(pd.date_range(first, last, freq=f"{days}D")) + [last + pd.Timedelta(days=1)]
+    return [(a, b) for a, b in zip(edges[:-1], edges[1:]) if a < b]
+
+
+def pooled_chunk_loader(read, windows, horizon, symbols, cutoff, part="train", pad_days=None, categorical=True):
+    """
+    load(i) for ChunkIter: the pooled rows (see pooled_model._prepare_pooled) of Date window i,
+    restricted to the training (Date < cutoff) or test (Date >= cutoff) part.
+
+    read(start, end) returns the raw feature rows of every symbol with start <= Date < end.
+    A window is read with pad_days extra days so the forward-return Target of its last rows
+    is defined; cross-sectional features only need the rows of the same date, which a
+    window always holds in full. The feature columns are recorded in load.feature_cols.
+    categorical=False passes SymbolCode as its integer code (NaN for unknown symbols) instead
+    of a pandas categorical.
+    """
+    pad = pd.Timedelta(days=pad_days if pad_days is not None else 2 * horizon + 10)
+
+    def load(i):
+        start, end = windows[i]
+        if (part == "train" and start >= cutoff) or (part == "test" and end <= cutoff):
+            return None
+        df = read(start, end + pad)
+        if df.empty:
+            return None
+        df, feature_cols, _ = _prepare_pooled(df, horizon, symbols=symbols)
+        in_part = (df["Date"] < cutoff) if part == "train" else (df["Date"] >= cutoff)
+        df = df[(df["Date"] >= start) & (df["Date"] < end) & in_part & df["Target"].notna()]
+        load.feature_cols = feature_cols
+        X = df[feature_cols]
+        if not categorical:
+            X = X.assign(SymbolCode=symbol_codes(X["SymbolCode"]))
+        return X, df["Target"]
+
+    load.feature_cols = None
+    return load
+
+
+def train_pooled_out_of_core(read, first, last, symbols, n_trees=300, horizon=1, use_gpu=False, seed=42,
+                             chunk_days=365, external_memory=False, cache_dir="cache/xgb_external", max_bin=256):
+    """
+    Train the pooled model (see pooled_model.train_pooled_model) without ever holding the
+    universe in memory. The rows are read back in Date windows of chunk_days through
+    read(start, end) and fed to XGBoost by a ChunkIter:
+
+    external_memory=False: QuantileDMatrix -- the chunks are sketched and stored as compressed
+        histogram bin indices (1 byte per value with max_bin <= 256) instead of float matrices.
+    external_memory=True: an external-memory DMatrix that pages the chunks to cache_dir, for
+        data whose binned form still does not fit in memory. XGBoost's external memory does
+        not handle categorical features correctly yet, so SymbolCode goes in as a numeric code.
+
+    XGBoost iterates over the chunks several times while building either matrix, so every
+    pass re-reads the windows; memory, not speed, is what this path is for. Peak memory is
+    one chunk plus the binned training matrix (nothing but the pages on disk with
+    external_memory). symbols fixes the SymbolCode categories (all symbols stored).
+    The train/test cutoff sits at 80% of the first..last date span. Saves the model through
+    the registry like the in-memory trainer (see pooled_model.save_pooled_model).
+    Returns the test R^2.
+    """
+    t0 = time.perf_counter()
+    first, last = pd.Timestamp(first), pd.Timestamp(last)
+    cutoff = (first + (last - first) * 0.8).normalize()
+    windows = date_windows(first, last, chunk_days)
+    symbols = sorted(symbols)
+
+    categorical = not external_memory
+    load = pooled_chunk_loader(read, windows, horizon, symbols, cutoff, "train", categorical=categorical)
+    if external_memory:
+        os.makedirs(cache_dir, exist_ok=True)
+        it = ChunkIter(len(windows), load, cache_prefix=os.path.join(cache_dir, f"pooled_{horizon}"))
+        dtrain = xgb.DMatrix(it)
+    else:
+        it = ChunkIter(len(windows), load)
+        dtrain = xgb.QuantileDMatrix(it, max_bin=max_bin, enable_categorical=True)
+    if dtrain.num_row() == 0:
+        raise ValueError("[ERROR] No training rows before the cutoff date.")
+
+    params = {
+        "objective": "reg:squarederror",
+        "tree_method": "gpu_hist" if use_gpu else "hist",
+        "max_bin": max_bin,
+        "seed": seed,
+    }
+    booster = xgb.train(params, dtrain, num_boost_round=n_trees)
+    n_train = dtrain.num_row()
+    del dtrain
+
+    # Test R^2 from running sums, one chunk at a time
+    test_load = pooled_chunk_loader(read, windows, horizon, symbols, cutoff, "test", categorical=categorical)
+    n, total, total_sq, sse = 0, 0.0, 0.0, 0.0
+    for i in range(len(windows)):
+        chunk = test_load(i)
+        if chunk is None or not len(chunk[0]):
+            continue
+        X, y = chunk
+        y = y.to_numpy(dtype=np.float64)
+        pred = booster.predict(xgb.DMatrix(X, enable_categorical=categorical))
+        n += len(y)
+        total += y.sum()
+        total_sq += (y ** 2).sum()
+        sse += ((y - pred) ** 2).sum()
+    ss_tot = total_sq - total ** 2 / n if n else 0.0
+    r2 = 1 - sse / ss_tot if ss_tot > 0 else float("nan")
+
+    model_path = save_pooled_model(booster, horizon, load.feature_cols, symbols, cutoff, categorical=categorical,
+                                   r2=r2, train_rows=n_train, chunks=len(windows))
+    print(f"[SAVED] Pooled model ({len(symbols)} symbols, {n_train} rows in {len(windows)} chunks) saved to "
+          f"{model_path} | R^2 Score: {r2:.4f}")
+    print(f"[SUMMARY] Trained 1 pooled model out of core in {time.perf_counter() - t0:.1f}s")
+    return r2
@@ -0,0 +1,178 @@
+# pooled_model.py
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import r2_score
+
+from data.compact import restore_dates
+from strategies.model_registry import get_registry
+from strategies.xboost_tree_eval import save_rankings
+
+# Registry name of the pooled model: models/{horizon}/model__pooled.ubj + .meta.json. The "_"
+# prefix is reserved, so ModelRegistry.list_symbols() never mistakes it for a symbol's model.
+POOLED_SYMBOL = "_pooled"
+
+# Features that get a per-date rank and z-score across the universe
+CROSS_SECTIONAL_COLS = ["return_1", "return_5", "return_22", "return_252", "ma_5_20_ratio",
+                        "rsi_14", "vol_10", "bollinger_b", "dollar_volume"]
+
+
+def pooled_model_path(horizon=1):
+    return get_registry().model_path(POOLED_SYMBOL, horizon)
+
+
+def legacy_pooled_path(horizon=1):
+    return f"models/{horizon}/pooled_model.joblib"
+
+
+def save_pooled_model(model, horizon, features, symbols, cutoff, categorical=True, **extra):
+    """
+    Store the pooled model (XGBRegressor or Booster) through the model registry, with its
+    feature list, SymbolCode categories and train/test cutoff in the metadata.
+    categorical=False: SymbolCode was fed as its numeric code (see symbol_codes).
+    Returns the model path.
+    """
+    return get_registry().save(model, POOLED_SYMBOL, horizon, features=features,
+                               symbols=list(symbols), cutoff=str(pd.Timestamp(cutoff).date()),
+                               categorical=categorical, **extra)
+
+
+def load_pooled_model(horizon=1):
+    """
+    (booster, info) of the saved pooled model; info has features, symbols, cutoff, categorical
+    and path. Models pickled by earlier versions (pooled_model.joblib) are still read.
+    """
+    registry = get_registry()
+    meta = registry.meta(POOLED_SYMBOL, horizon)
+    if meta is not None and registry.exists(POOLED_SYMBOL, horizon):
+        info = {k: meta[k] for k in ("features", "symbols", "categorical")}
+        info.update(cutoff=pd.Timestamp(meta["cutoff"]), path=registry.resolve_path(POOLED_SYMBOL, horizon))
+        return registry.load(POOLED_SYMBOL, horizon).get_booster(), info
+    path = legacy_pooled_path(horizon)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"[ERROR] {pooled_model_path(horizon)} not found. Train the pooled model first.")
+    saved = joblib.load(path)
+    model = saved["model"]
+    info = {"features": saved["features"], "symbols": saved["symbols"], "cutoff": saved["cutoff"],
+            "categorical": saved.get("categorical", True), "path": path}
+    return (model if isinstance(model, xgb.Booster) else model.get_booster()), info
+
+
+def add_cross_sectional_features(df, cols=None):
+    """
+    Add {col}_cs_rank (percentile rank within the day) and {col}_cs_z (z-score within the day)
+    for each of cols, so the pooled model sees where a symbol stands relative to the universe.
+    """
+    cols = [c for c in (cols or CROSS_SECTIONAL_COLS) if c in df.columns]
+    by_date = df.groupby("Date", sort=False)[cols]
+    ranks = by_date.rank(pct=True)
+    mean = by_date.transform("mean")
+    std = by_date.transform("std")
+    for c in cols:
+        df[f"{c}_cs_rank"] = ranks[c].astype(np.float32)
+        df[f"{c}_cs_z"] = ((df[c] - mean[c]) / (std[c] + 1e-12)).astype(np.float32)
+    return df
+
+
+def _prepare_pooled(df, horizon, symbols=None):
+    """
+    Stack the universe into one frame: forward-return Target per symbol, cross-sectional
+    features per date and Symbol as a categorical input with a fixed category list.
+    Rows without a Target (the last `horizon` bars of each symbol) are kept; Target is NaN there.
+    """
+    df = df.sort_values(["Symbol", "Date"], kind="stable").reset_index(drop=True)
+    df["Date"] = restore_dates(df["Date"])  # compact frames carry int32 day numbers
+    df["Symbol"] = df["Symbol"].astype(str)
+    # Same target as the per-symbol models: pct_change(horizon).shift(-horizon)
+    df["Target"] = df.groupby("Symbol", sort=False)["Close"].shift(-horizon) / df["Close"] - 1
+    df = add_cross_sectional_features(df)
+    symbols = symbols if symbols is not None else sorted(df["Symbol"].unique())
+    df["SymbolCode"] = pd.Categorical(df["Symbol"], categories=symbols)
+    feature_cols = [c for c in df.columns if c not in ["Date", "Symbol", "Close", "Target"]]
+    return df, feature_cols, symbols
+
+
+def symbol_codes(codes):
+    """
+    SymbolCode categorical as float codes (NaN for symbols outside the category list).
+    """
+    return codes.cat.codes.astype(np.float32).replace(-1, np.nan)
+
+
+def _date_split(dates, frac=0.8):
+    """
+    Cutoff date putting ~frac of the rows before it; every symbol is split at the same date
+    so no test day of one symbol is seen in training through another.
+    """
+    unique = np.sort(dates.unique())
+    return unique[int(len(unique) * frac)]
+
+
+def train_pooled_model(df, n_trees=300, horizon=1, use_gpu=False, seed=42):
+    """
+    Train a single XGBoost model over the stacked universe and save it with its feature list
+    and symbol categories through the model registry (see save_pooled_model).
+    """
+    t0 = time.perf_counter()
+    df, feature_cols, symbols = _prepare_pooled(df, horizon)
+    df = df.dropna(subset=["Target"])
+    cutoff = _date_split(df["Date"])
+    train, test = df[df["Date"] < cutoff], df[df["Date"] >= cutoff]
+
+    model = xgb.XGBRegressor(
+        objective='reg:squarederror',
+        n_estimators=n_trees,
+        tree_method='gpu_hist' if use_gpu else 'hist',
+        enable_categorical=True,
+        random_state=seed,
+    )
+    model.fit(train[feature_cols], train["Target"])
+    r2 = r2_score(test["Target"], model.predict(test[feature_cols]))
+
+    model_path = save_pooled_model(model, horizon, feature_cols, symbols, cutoff, r2=r2, train_rows=len(train))
+    print(f"[SAVED] Pooled model ({len(symbols)} symbols, {len(train)} rows) saved to {model_path} "
+          f"| R^2 Score: {r2:.4f}")
+    print(f"[SUMMARY] Trained 1 pooled model in {time.perf_counter() - t0:.1f}s")
+    return r2
+
+
+def evaluate_pooled_model(df, horizon=1, save=True):
+    """
+    Rank symbols with the pooled model. Writes the same ranking CSV as evaluate_models
+    (Symbol, PredictedReturn, RMSE, ModelPath): PredictedReturn is the prediction for each
+    symbol's latest feature row and RMSE is measured on that symbol's rows after the
+    training cutoff date.
+    """
+    booster, saved = load_pooled_model(horizon)
+    model_path, feature_cols = saved["path"], saved["features"]
+
+    df, _, _ = _prepare_pooled(df, horizon, symbols=saved["symbols"])
+    unknown = df["SymbolCode"].isna() & df["Symbol"].notna()
+    if unknown.any():
+        print(f"[WARNING] {df.loc[unknown, 'Symbol'].nunique()} symbols not seen in training; scored without identity")
+
+    X = df[feature_cols]
+    if not saved["categorical"]:
+        # Trained out of core on external memory, with numeric symbol codes
+        X = X.assign(SymbolCode=symbol_codes(X["SymbolCode"]))
+    df["Pred"] = booster.predict(xgb.DMatrix(X, enable_categorical=saved["categorical"]))
+
+    latest = df.groupby("Symbol", sort=False).tail(1)
+    test = df[(df["Date"] >= saved["cutoff"]) & df["Target"].notna()]
+    rmse = np.sqrt(((test["Target"] - test["Pred"]) ** 2).groupby(test["Symbol"]).mean())
+    if len(test):
+        print(f"[EVAL] Pooled model | R²: {r2_score(test['Target'], test['Pred']):.4f} over {len(test)} rows")
+
+    results_df = pd.DataFrame({
+        "Symbol": latest["Symbol"].to_numpy(),
+        "PredictedReturn": latest["Pred"].to_numpy(),
+        "RMSE": rmse.reindex(latest["Symbol"]).to_numpy(),
+        "ModelPath": model_path,
+    })
+    if save:
+        results_df = save_rankings(results_df, horizon)
+    return results_df
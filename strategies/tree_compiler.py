@@ -0,0 +1,347 @@
+# tree_compiler.py
+import json
+import os
+
+import numpy as np
+
+from strategies.model_registry import get_registry
+
+
+def _booster_trees(booster):
+    """
+    (trees, base_score, feature_names) from the booster's JSON model. Only gbtree models with
+    the identity link of reg:squarederror and numeric splits can be compiled.
+    """
+    model = json.loads(booster.save_raw("json"))
+    learner = model["learner"]
+    if learner["gradient_booster"]["name"] != "gbtree":
+        raise ValueError(f"Cannot compile a {learner['gradient_booster']['name']} booster")
+    if learner["objective"]["name"] != "reg:squarederror":
+        raise ValueError(f"Cannot compile objective {learner['objective']['name']}")
+    trees = learner["gradient_booster"]["model"]["trees"]
+    best = booster.attr("best_iteration")
+    if best is not None:
+        # predict() stops at the early-stopping iteration
+        trees = trees[:int(best) + 1]
+    base_score = float(learner["learner_model_param"]["base_score"])
+    return trees, base_score, booster.feature_names
+
+
+def compile_booster(booster):
+    """
+    Flatten every tree of a booster into node arrays:
+        feature, threshold, left, right, default_left, value   (one entry per node)
+        roots                                                  (one entry per tree)
+    Child indices point into the same arrays. Leaves point to themselves, so an evaluator can
+    step every tree the same number of times (depth) without checking for leaves.
+    Returns a dict of arrays plus base_score, depth and the booster's feature names.
+    """
+    trees, base_score, features = _booster_trees(booster)
+
+    parts = {k: [] for k in ("feature", "threshold", "left", "right", "default_left", "value")}
+    roots, offset, depth = [], 0, 0
+    for tree in trees:
+        if any(tree["split_type"]):
+            raise ValueError("Cannot compile categorical splits")
+        left = np.asarray(tree["left_children"], dtype=np.int32)
+        right = np.asarray(tree["right_children"], dtype=np.int32)
+        cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+        split = np.asarray(tree["split_indices"], dtype=np.int32)
+        leaf = left == -1
+        idx = np.arange(len(left), dtype=np.int32)
+
+        parts["feature"].append(np.where(leaf, 0, split))
+        parts["threshold"].append(np.where(leaf, 0, cond).astype(np.float32))
+        parts["left"].append(np.where(leaf, idx, left) + offset)
+        parts["right"].append(np.where(leaf, idx, right) + offset)
+        parts["default_left"].append(np.asarray(tree["default_left"], dtype=bool))
+        parts["value"].append(np.where(leaf, cond, 0).astype(np.float32))
+        roots.append(offset)
+        offset += len(left)
+
+        node_depth = np.zeros(len(left), dtype=np.int32)
+        for i in idx[~leaf]:  # children always come after their parent
+            node_depth[left[i]] = node_depth[right[i]] = node_depth[i] + 1
+        depth = max(depth, int(node_depth.max()))
+
+    out = {k: np.concatenate(v) if v else np.zeros(0) for k, v in parts.items()}
+    out["feature"] = out["feature"].astype(np.int32)
+    out["left"] = out["left"].astype(np.int32)
+    out["right"] = out["right"].astype(np.int32)
+    out["roots"] = np.asarray(roots, dtype=np.int32)
+    out["base_score"] = base_score
+    out["depth"] = depth
+    out["features"] = list(features or [])
+    return out
+
+
+class CompiledForest:
+    """
+    Many compiled models in one set of flat arrays, scored with plain NumPy.
+
+    Model m owns trees tree_start[m] .. tree_start[m] + tree_count[m]. predict() walks every
+    (row, tree) pair of a batch at once, one tree level per step, so scoring the latest row of
+    500 symbols with 500 different models is a handful of vectorized operations instead of
+    500 predict() calls.
+    """
+    ARRAYS = ("feature", "threshold", "left", "right", "default_left", "value", "roots",
+              "tree_start", "tree_count", "base_score")
+
+    def __init__(self, symbols, features, depth, **arrays):
+        self.symbols = list(symbols)
+        self.features = list(features)
+        self.depth = int(depth)
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self._lookup = None
+        self._last_pairs = None
+        self._usage = None
+
+    def _build_lookup(self):
+        """
+        Per-node arrays for predict(): the column to read in the widened row (the -inf copy
+        for default-left nodes, the +inf copy otherwise) and interleaved (left, right) children.
+        """
+        n_cols = len(self.features)
+        column = self.feature.astype(np.int64) + np.where(self.default_left, 0, n_cols)
+        children = np.empty(2 * len(self.left), dtype=np.int64)
+        children[0::2], children[1::2] = self.left, self.right
+        self._lookup = (column, self.threshold, children)
+
+    @classmethod
+    def from_compiled(cls, compiled, features=None):
+        """
+        Pack {symbol: compile_booster(...)} into one forest. features: shared column order
+        (default: the union of the models' features in first-seen order); every model's split
+        indices are remapped to it.
+        """
+        symbols = list(compiled)
+        compiled = list(compiled.values())
+        if features is None:
+            features = []
+            for c in compiled:
+                features += [f for f in c["features"] if f not in features]
+        pos = {f: i for i, f in enumerate(features)}
+
+        node_offsets = np.cumsum([0] + [len(c["feature"]) for c in compiled])
+        tree_counts = np.array([len(c["roots"]) for c in compiled], dtype=np.int32)
+        arrays = {
+            "feature": np.concatenate([np.array([pos[f] for f in c["features"]], dtype=np.int32)[c["feature"]]
+                                       if c["features"] else c["feature"] for c in compiled]),
+            "threshold": np.concatenate([c["threshold"] for c in compiled]),
+            "left": np.concatenate([c["left"] + o for c, o in zip(compiled, node_offsets)]),
+            "right": np.concatenate([c["right"] + o for c, o in zip(compiled, node_offsets)]),
+            "default_left": np.concatenate([c["default_left"] for c in compiled]),
+            "value": np.concatenate([c["value"] for c in compiled]),
+            "roots": np.concatenate([c["roots"] + o for c, o in zip(compiled, node_offsets)]),
+            "tree_start": np.concatenate([[0], np.cumsum(tree_counts)[:-1]]).astype(np.int64),
+            "tree_count": tree_counts,
+            "base_score": np.array([c["base_score"] for c in compiled], dtype=np.float32),
+        }
+        depth = max((c["depth"] for c in compiled), default=0)
+        return cls(symbols, features, depth, **arrays)
+
+    def predict(self, X, models):
+        """
+        Score row i of X (columns in self.features order) with model models[i] (an index
+        into self.symbols) for every i. Matches Booster.predict to float32 precision.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        models = np.asarray(models, dtype=np.int64)
+        n, n_cols = len(models), len(self.features)
+        counts = self.tree_count[models]
+        total = int(counts.sum())
+        if total == 0:
+            return self.base_score[models].astype(np.float32)
+        if self._lookup is None:
+            self._build_lookup()
+
+        # [X with NaN -> -inf | X with NaN -> +inf]: a missing value then takes the node's
+        # default direction through the same x < threshold test as every other value
+        wide = np.empty((n, 2 * n_cols), dtype=np.float32)
+        wide[:, :n_cols] = np.nan_to_num(X, nan=-np.inf, posinf=np.inf, neginf=-np.inf)
+        wide[:, n_cols:] = np.nan_to_num(X, nan=np.inf, posinf=np.inf, neginf=-np.inf)
+        wide = wide.ravel()
+
+        pair_row, row_base, roots = self._pairs(models, counts, total, n_cols)
+        node = roots
+        column, threshold, children = self._lookup
+        for _ in range(self.depth):
+            go_right = wide[row_base + column[node]] >= threshold[node]
+            node = children[2 * node + go_right]
+
+        margin = np.bincount(pair_row, weights=self.value[node], minlength=n)
+        return (margin + self.base_score[models]).astype(np.float32)
+
+    def _pairs(self, models, counts, total, n_cols):
+        """
+        One entry per (row, tree) pair: its row, the row's offset in the widened matrix and the
+        tree's root node. A live loop re-scores the same models every time, so the last
+        layout is kept.
+        """
+        key = models.tobytes()
+        if self._last_pairs is not None and self._last_pairs[0] == key:
+            return self._last_pairs[1]
+        pair_row = np.repeat(np.arange(len(models)), counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        pair_tree = np.repeat(self.tree_start[models], counts) + (np.arange(total) - first)
+        pairs = (pair_row, pair_row * (2 * n_cols), self.roots[pair_tree].astype(np.int64))
+        self._last_pairs = (key, pairs)
+        return pairs
+
+    def feature_usage(self):
+        """
+        (n_models, n_features) bool matrix: the features each model actually splits on.
+        """
+        if self._usage is None:
+            nodes = np.arange(len(self.feature))
+            split = self.left != nodes  # leaves point to themselves
+            tree_of_node = np.searchsorted(self.roots, nodes, side="right") - 1
+            model_of_tree = np.repeat(np.arange(len(self.symbols)), self.tree_count)
+            self._usage = np.zeros((len(self.symbols), len(self.features)), dtype=bool)
+            self._usage[model_of_tree[tree_of_node[split]], self.feature[split]] = True
+        return self._usage
+
+    def predict_symbol(self, symbol, X):
+        """
+        Score every row of X with one symbol's model.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        return self.predict(X, np.full(len(X), self.index[symbol]))
+
+    def save(self, path, sources=None):
+        """
+        Write the forest to an .npz file. sources: {symbol: model file mtime} stored alongside
+        so load_compiled can tell which compiled models went stale.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {"symbols": self.symbols, "features": self.features, "depth": self.depth,
+                "sources": sources or {}}
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+                 **{name: getattr(self, name) for name in self.ARRAYS})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode())
+            arrays = {name: data[name] for name in cls.ARRAYS}
+        forest = cls(meta["symbols"], meta["features"], meta["depth"], **arrays)
+        forest.sources = meta["sources"]
+        return forest
+
+
+def export_compiled(horizon=1, symbols=None, root="models"):
+    """
+    Compile every saved per-symbol model of a horizon (or just `symbols`) into
+    {root}/{horizon}/compiled_trees.npz. Models that cannot be compiled are skipped with a
+    warning and keep being scored by XGBoost. Returns the CompiledForest (None if empty).
+    """
+    registry = get_registry(root)
+    if symbols is None:
+        symbols = registry.list_symbols(horizon)
+    symbols = [s for s in symbols if not s.startswith("_")]  # reserved: pooled model etc.
+
+    compiled, sources = {}, {}
+    for symbol in symbols:
+        path = registry.resolve_path(symbol, horizon)
+        if path is None:
+            print(f"[MISSING] Model not found for {symbol}")
+            continue
+        try:
+            compiled[symbol] = compile_booster(registry.load(symbol, horizon).get_booster())
+            sources[symbol] = os.path.getmtime(path)
+        except Exception as e:
+            print(f"[WARNING] Cannot compile model for {symbol}: {e}")
+    if not compiled:
+        print(f"[SUMMARY] No models to compile for horizon {horizon}.")
+        return None
+
+    forest = CompiledForest.from_compiled(compiled)
+    out_path = registry.compiled_path(horizon)
+    forest.save(out_path, sources)
+    print(f"[SAVED] Compiled {len(forest.symbols)} models ({len(forest.feature)} nodes, depth {forest.depth}) "
+          f"to {out_path}")
+    return forest
+
+
+_loaded = {}  # path -> (mtime, CompiledForest), so a live loop does not re-read the file
+
+
+def load_compiled(horizon=1, root="models"):
+    """
+    The compiled forest of a horizon and the symbols whose model file changed since it was
+    compiled (score those with XGBoost), or (None, []) when nothing was exported. Reserved
+    "_" names (a pooled model compiled by an older export) count as stale.
+    """
+    registry = get_registry(root)
+    path = registry.compiled_path(horizon)
+    if not os.path.exists(path):
+        return None, []
+    mtime = os.path.getmtime(path)
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _loaded[path] = (mtime, CompiledForest.load(path))
+    forest = cached[1]
+    stale = []
+    for symbol in forest.symbols:
+        if symbol.startswith("_"):
+            stale.append(symbol)
+            continue
+        model_path = registry.resolve_path(symbol, horizon)
+        if model_path is None or os.path.getmtime(model_path) != forest.sources.get(symbol):
+            stale.append(symbol)
+    return forest, stale
+
+
+if __name__ == "__main__":
+    # Export a model directory holding per-symbol models and a pooled model, then score the
+    # latest rows compiled and with XGBoost; also score against an older export that still
+    # compiled the pooled model (whose SymbolCode column the latest rows do not have).
+    import tempfile
+    import pandas as pd
+    import xgboost as xgb
+    from strategies.pooled_model import POOLED_SYMBOL, save_pooled_model
+    from strategies.xboost_tree_eval import predict_latest
+
+    rng = np.random.default_rng(0)
+    features = [f"f{i}" for i in range(4)]
+    X = pd.DataFrame(rng.normal(size=(400, 4)), columns=features)
+    X.iloc[::7, 2] = np.nan
+    y = X["f0"].fillna(0) - 0.5 * X["f1"] + rng.normal(scale=0.1, size=len(X))
+    latest = pd.DataFrame(rng.normal(size=(2, 4)), columns=features)
+    latest.insert(0, "Date", pd.Timestamp("2024-01-02"))
+    latest.insert(0, "Symbol", ["AAA", "BBB"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        registry = get_registry()
+        for seed, symbol in enumerate(["AAA", "BBB"]):
+            model = xgb.XGBRegressor(n_estimators=20, max_depth=3, random_state=seed)
+            registry.save(model.fit(X, y), symbol)
+        pooled_X = X.assign(SymbolCode=rng.integers(0, 2, len(X)).astype(float))
+        pooled = xgb.XGBRegressor(n_estimators=20, max_depth=3).fit(pooled_X, y)
+        save_pooled_model(pooled, 1, list(pooled_X.columns), ["AAA", "BBB"], "2024-01-01",
+                          categorical=False)
+
+        forest = export_compiled(1)
+        assert forest.symbols == ["AAA", "BBB"], forest.symbols
+        expected = predict_latest(latest)
+        scored = predict_latest(latest, compiled=True)
+        assert (scored["ModelPath"] == registry.compiled_path(1)).all(), scored
+        np.testing.assert_allclose(scored["PredictedReturn"], expected["PredictedReturn"], rtol=1e-5)
+
+        # An export from before the pooled model was excluded
+        compiled = {s: compile_booster(registry.load(s).get_booster())
+                    for s in ["AAA", "BBB", POOLED_SYMBOL]}
+        sources = {s: os.path.getmtime(registry.resolve_path(s)) for s in compiled}
+        CompiledForest.from_compiled(compiled).save(registry.compiled_path(1), sources)
+        forest, stale = load_compiled(1)
+        assert stale == [POOLED_SYMBOL], stale
+        assert forest.feature_usage()[forest.index[POOLED_SYMBOL], forest.features.index("SymbolCode")]
+        scored = predict_latest(latest, compiled=True)
+        np.testing.assert_allclose(scored["PredictedReturn"], expected["PredictedReturn"], rtol=1e-5)
+        print(scored.to_string(index=False))
+        os.chdir("/")
@@ -0,0 +1,230 @@
+# tuning.py
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from strategies.model_registry import get_registry
+from strategies.xboost_tree_eval import _prepare_symbol, _symbol_groups
+
+# (low, high, scale) per searched parameter; "int" draws whole numbers, "log" is log-uniform
+SEARCH_SPACE = {
+    "learning_rate": (0.01, 0.3, "log"),
+    "max_depth": (2, 8, "int"),
+    "min_child_weight": (1.0, 50.0, "log"),
+    "subsample": (0.5, 1.0, "linear"),
+    "colsample_bytree": (0.4, 1.0, "linear"),
+    "reg_lambda": (0.1, 20.0, "log"),
+    "reg_alpha": (1e-3, 5.0, "log"),
+    "gamma": (1e-4, 1.0, "log"),
+}
+
+
+def sample_params(rng, space=None):
+    params = {}
+    for name, (low, high, scale) in (space or SEARCH_SPACE).items():
+        if scale == "int":
+            params[name] = int(rng.integers(low, high + 1))
+        elif scale == "log":
+            params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            params[name] = float(rng.uniform(low, high))
+    return params
+
+
+def validation_split(X, y, horizon=1, val_frac=0.2):
+    """
+    Time-ordered (fit, validation) split inside the training part of train_models' 80/20
+    split, so the test rows used by evaluate_models never influence tuning. The last
+    `horizon` fit rows are dropped: their targets look into the validation window.
+    """
+    train_end = int(len(X) * 0.8)
+    val_start = train_end - int(train_end * val_frac)
+    fit_end = val_start - horizon
+    X, y = X.to_numpy(dtype=np.float32), y.to_numpy(dtype=np.float32)
+    return X[:fit_end], y[:fit_end], X[val_start:train_end], y[val_start:train_end]
+
+
+# Per-process tuning data: {symbol: (X_fit, y_fit, X_val, y_val)}, set once per worker
+_DATA = {}
+_DMATRICES = {}
+
+
+def _init_worker(data):
+    global _DATA, _DMATRICES
+    _DATA, _DMATRICES = data, {}
+
+
+def _score_trial(trial_id, params, rounds, early_stopping_rounds, seed, n_threads):
+    """
+    Fit every tuning symbol with params for up to `rounds` trees, early-stopped on its
+    validation slice. Returns (trial_id, mean best validation RMSE, mean best tree count).
+    """
+    booster_params = {"objective": "reg:squarederror", "tree_method": "hist", "eval_metric": "rmse",
+                      "seed": seed, **params}
+    if n_threads:
+        booster_params["nthread"] = n_threads
+    rmses, trees = [], []
+    for symbol, (X_fit, y_fit, X_val, y_val) in _DATA.items():
+        if symbol not in _DMATRICES:
+            _DMATRICES[symbol] = (xgb.DMatrix(X_fit, label=y_fit), xgb.DMatrix(X_val, label=y_val))
+        dfit, dval = _DMATRICES[symbol]
+        booster = xgb.train(booster_params, dfit, num_boost_round=rounds, evals=[(dval, "val")],
+                            early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+        rmses.append(booster.best_score)
+        trees.append(booster.best_iteration + 1)
+    return trial_id, float(np.mean(rmses)), float(np.mean(trees))
+
+
+def _tuning_data(df, horizon, n_symbols, val_frac, rng):
+    """
+    Validation splits for up to n_symbols symbols with enough history: a random sample of a
+    DataFrame, or the first n_symbols of a streamed (symbol, frame) iterator.
+    """
+    if isinstance(df, pd.DataFrame):
+        if n_symbols:
+            symbols = np.asarray(df["Symbol"].dropna().unique())
+            df = df[df["Symbol"].isin(rng.permutation(symbols)[:n_symbols])]
+        groups = _symbol_groups(df)
+    else:
+        groups = islice(df, n_symbols) if n_symbols else df
+
+    data = {}
+    for symbol, group in groups:
+        try:
+            _, X, y = _prepare_symbol(group, horizon)
+            if len(X) < 100:
+                print(f"[SKIP] {symbol}: Not enough data")
+                continue
+            data[symbol] = validation_split(X, y, horizon, val_frac)
+        except Exception as e:
+            print(f"[WARNING] Tuning data for {symbol}: {e}")
+    return data
+
+
+def tune(df, horizon=1, n_trials=32, time_budget=None, max_rounds=1000, min_rounds=None, eta=3,
+         early_stopping_rounds=50, n_symbols=20, val_frac=0.2, n_jobs=1, threads_per_trial=None,
+         seed=42, save=True):
+    """
+    Random search over SEARCH_SPACE with successive halving, for one horizon.
+
+    Every trial fits the tuning symbols (a random sample of n_symbols, all if None) on the
+    first part of their training split and is early-stopped on the time-ordered validation
+    slice after it (see validation_split). Trials start with min_rounds trees (default:
+    max_rounds / eta^2); after each rung only the best 1/eta of them continue with eta times
+    more trees, up to max_rounds. Trials run in parallel in n_jobs processes.
+
+    time_budget (seconds) caps the wall clock: no new trials start once it is spent. The
+    winner of the last completed rung is kept unless a trial of the interrupted rung scored
+    better. The winner is written to
+    models/{horizon}/best_params.json with n_estimators = its mean early-stopped tree count,
+    and train_models picks it up from there.
+    Returns the saved config dict, or None when no trial finished.
+    """
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    data = _tuning_data(df, horizon, n_symbols, val_frac, rng)
+    if not data:
+        print("[SUMMARY] No symbols with enough data to tune.")
+        return None
+
+    n_jobs = (os.cpu_count() or 1) if n_jobs == -1 else max(1, n_jobs)
+    if threads_per_trial is None and n_jobs > 1:
+        threads_per_trial = max(1, (os.cpu_count() or 1) // n_jobs)
+    min_rounds = min_rounds or max(10, int(max_rounds / eta ** 2))
+    trials = {i: sample_params(rng) for i in range(n_trials)}
+    print(f"[INFO] Tuning h={horizon}: {n_trials} trials on {len(data)} symbols, "
+          f"{min_rounds}-{max_rounds} trees, {n_jobs} processes")
+
+    def out_of_time():
+        return time_budget is not None and time.perf_counter() - t0 > time_budget
+
+    if n_jobs > 1:
+        # spawn: forking after XGBoost/OpenMP has run in this process can deadlock the children
+        pool = ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(data,))
+    else:
+        pool = None
+        _init_worker(data)
+
+    history = []
+    best = None
+    rounds = min_rounds
+    alive = list(trials)
+    try:
+        while alive:
+            scores = {}
+            if pool is None:
+                for i in alive:
+                    if out_of_time():
+                        break
+                    _, rmse, trees = _score_trial(i, trials[i], rounds, early_stopping_rounds, seed, threads_per_trial)
+                    scores[i] = (rmse, trees)
+            else:
+                futures = [pool.submit(_score_trial, i, trials[i], rounds, early_stopping_rounds, seed,
+                                       threads_per_trial) for i in alive]
+                for f in as_completed(futures):
+                    i, rmse, trees = f.result()
+                    scores[i] = (rmse, trees)
+                    if out_of_time():
+                        for other in futures:
+                            other.cancel()
+                        break
+
+            for i, (rmse, trees) in scores.items():
+                history.append({"trial": i, "rounds": rounds, "val_rmse": rmse, "n_estimators": trees, **trials[i]})
+                print(f"[EVAL] Trial {i} | {rounds} trees | val RMSE: {rmse:.5f} | best iteration: {trees:.0f}")
+            if scores:
+                i = min(scores, key=lambda k: scores[k][0])
+                # A rung cut short by the budget may hold only a trial or two: it replaces the
+                # previous rung's winner only if it beat it
+                if len(scores) == len(alive) or best is None or scores[i][0] < best["val_rmse"]:
+                    best = {"trial": i, "rounds": rounds, "val_rmse": scores[i][0], "n_estimators": scores[i][1]}
+
+            if out_of_time():
+                print(f"[INFO] Time budget of {time_budget}s spent after {len(history)} trial runs")
+                break
+            if rounds >= max_rounds or len(alive) == 1:
+                break
+            ranked = sorted(scores, key=lambda k: scores[k][0])
+            alive = ranked[:max(1, math.ceil(len(ranked) / eta))]
+            rounds = min(rounds * eta, max_rounds)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    if best is None:
+        print("[SUMMARY] No tuning trial finished within the budget.")
+        return None
+
+    config = {
+        "horizon": horizon,
+        "params": trials[best["trial"]],
+        "n_estimators": max(1, int(round(best["n_estimators"]))),
+        "val_rmse": best["val_rmse"],
+        "rounds": best["rounds"],
+        "trials": n_trials,
+        "trial_runs": len(history),
+        "symbols": sorted(data),
+        "tuned": datetime.now().isoformat(timespec="seconds"),
+        "elapsed_sec": time.perf_counter() - t0,
+    }
+    print(f"[SUMMARY] Best trial {best['trial']} | val RMSE: {best['val_rmse']:.5f} | "
+          f"n_estimators: {config['n_estimators']} | {len(history)} runs in {config['elapsed_sec']:.1f}s")
+
+    if save:
+        path = get_registry().save_best_params(config, horizon)
+        history_path = f"logs/tuning/{horizon}/trials_{datetime.now().strftime('%Y-%m-%d')}.json"
+        os.makedirs(os.path.dirname(history_path), exist_ok=True)
+        with open(history_path, "w") as f:
+            json.dump(history, f, indent=2)
+        print(f"[SAVED] Best parameters: {path} | Trial history: {history_path}")
+    return config
@@ -0,0 +1,189 @@
+# walk_forward.py
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from data.compact import restore_dates
+from strategies.xboost_tree_eval import _prepare_symbol, _symbol_groups
+
+DEFAULT_PARAMS = {"objective": "reg:squarederror", "tree_method": "hist"}
+
+
+def make_folds(n_rows, test_size=63, step=None, horizon=1, mode="expanding", train_size=756, min_train=252):
+    """
+    Walk-forward (train, test) row ranges over n_rows date-ordered rows.
+
+    mode="expanding": every fold trains on all rows before its test window.
+    mode="rolling": every fold trains on the train_size rows before its test window.
+    Test windows of test_size rows start at min_train (expanding) / train_size (rolling) and
+    move forward by step (default: test_size). The last `horizon` training rows before each
+    test window are dropped: their targets look into the test window.
+    Returns [(train_start, train_end, test_start, test_end)] with exclusive ends.
+    """
+    step = step or test_size
+    first = min_train if mode == "expanding" else train_size
+    folds = []
+    for test_start in range(first, n_rows - test_size + 1, step):
+        train_end = test_start - horizon
+        train_start = 0 if mode == "expanding" else max(0, test_start - train_size)
+        if train_end - train_start < min(min_train, train_size):
+            continue
+        folds.append((train_start, train_end, test_start, test_start + test_size))
+    return folds
+
+
+class FoldCache:
+    """
+    Fold metrics on disk, keyed by a hash of the model settings and the fold's rows:
+        {root}/{horizon}/fold_metrics.json
+    A fold whose training/test rows and model settings are unchanged is never rescored.
+    """
+    def __init__(self, root="logs/walk_forward", horizon=1):
+        self.path = os.path.join(root, str(horizon), "fold_metrics.json")
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        self.dirty = False
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, metrics):
+        self.entries[key] = metrics
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+def model_key(params, n_trees, seed):
+    """
+    Hash of everything that changes a fold's model apart from its data.
+    """
+    spec = {"params": params, "n_trees": n_trees, "seed": seed, "xgboost": xgb.__version__}
+    return hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _fold_key(mkey, row_hashes, fold, columns_key):
+    train_start, train_end, test_start, test_end = fold
+    h = hashlib.sha1(mkey.encode())
+    h.update(columns_key)
+    h.update(row_hashes[train_start:train_end].tobytes())
+    h.update(row_hashes[test_start:test_end].tobytes())
+    return h.hexdigest()[:24]
+
+
+def walk_forward_symbol(symbol, dates, X, y, folds, params, n_trees, seed, cache, mkey):
+    """
+    Score every fold of one symbol. One DMatrix is built for the whole history and each
+    fold trains and tests on slices of it, so the data is converted once per symbol instead
+    of once per fold. Returns a list of fold metric dicts.
+    """
+    # One 64-bit hash per row; a fold's cache key is the hash of its rows' hashes
+    row_hashes = pd.util.hash_pandas_object(pd.concat([X, y], axis=1), index=False).to_numpy()
+    columns_key = json.dumps(list(map(str, X.columns))).encode()
+    dates = restore_dates(dates).reset_index(drop=True)
+    y_all = y.to_numpy()
+
+    dmatrix = None
+    rows = []
+    for i, fold in enumerate(folds):
+        key = _fold_key(mkey, row_hashes, fold, columns_key)
+        metrics = cache.get(key)
+        if metrics is None:
+            if dmatrix is None:
+                dmatrix = xgb.DMatrix(X, label=y_all)
+            train_start, train_end, test_start, test_end = fold
+            dtrain = dmatrix.slice(np.arange(train_start, train_end))
+            dtest = dmatrix.slice(np.arange(test_start, test_end))
+            booster = xgb.train({**params, "seed": seed}, dtrain, num_boost_round=n_trees)
+            pred = booster.predict(dtest)
+            actual = y_all[test_start:test_end]
+            ss_res = float(np.sum((actual - pred) ** 2))
+            ss_tot = float(np.sum((actual - actual.mean()) ** 2))
+            metrics = {
+                "rmse": float(np.sqrt(ss_res / len(actual))),
+                "r2": 1 - ss_res / ss_tot if ss_tot > 0 else float("nan"),
+                "hit_rate": float(np.mean(np.sign(pred) == np.sign(actual))),
+            }
+            cache.put(key, metrics)
+            cached = False
+        else:
+            cached = True
+        train_start, train_end, test_start, test_end = fold
+        rows.append({
+            "Symbol": symbol,
+            "Fold": i,
+            "TrainStart": dates.iloc[train_start].date(),
+            "TrainEnd": dates.iloc[train_end - 1].date(),
+            "TestStart": dates.iloc[test_start].date(),
+            "TestEnd": dates.iloc[test_end - 1].date(),
+            "TrainRows": train_end - train_start,
+            "TestRows": test_end - test_start,
+            "RMSE": metrics["rmse"],
+            "R2": metrics["r2"],
+            "HitRate": metrics["hit_rate"],
+            "Cached": cached,
+        })
+    return rows
+
+
+def walk_forward(df, horizon=1, mode="expanding", test_size=63, step=None, train_size=756, min_train=252,
+                 n_trees=100, params=None, seed=42, cache_dir="logs/walk_forward", save=True):
+    """
+    Walk-forward evaluation of per-symbol XGBoost models over df (DataFrame or iterator of
+    (symbol, frame)). Folds follow make_folds(); fold metrics are cached in cache_dir so a
+    daily rerun only scores the folds whose rows changed (normally just the newest one).
+    Returns one row per symbol and fold, and saves it to
+    {cache_dir}/{horizon}/walk_forward_{date}.csv.
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    mkey = model_key(params, n_trees, seed)
+    cache = FoldCache(cache_dir, horizon)
+    t0 = time.perf_counter()
+
+    rows = []
+    for symbol, group in _symbol_groups(df):
+        try:
+            dates, X, y = _prepare_symbol(group, horizon)
+            folds = make_folds(len(X), test_size, step, horizon, mode, train_size, min_train)
+            if not folds:
+                print(f"[SKIP] {symbol}: Not enough data for a walk-forward fold")
+                continue
+            rows.extend(walk_forward_symbol(symbol, dates, X, y, folds, params, n_trees, seed, cache, mkey))
+        except Exception as e:
+            print(f"[ERROR] Walk-forward {symbol}: {e}")
+    cache.save()
+
+    results = pd.DataFrame(rows)
+    if results.empty:
+        print("[SUMMARY] No walk-forward folds scored.")
+        return results
+
+    scored = int((~results["Cached"]).sum())
+    print(f"[SUMMARY] {results['Symbol'].nunique()} symbols, {len(results)} folds "
+          f"({scored} scored, {len(results) - scored} from cache) in {time.perf_counter() - t0:.1f}s")
+    print(f"[SUMMARY] Mean RMSE: {results['RMSE'].mean():.4f} | Mean R²: {results['R2'].mean():.4f} "
+          f"| Hit rate: {results['HitRate'].mean():.3f}")
+
+    if save:
+        out_dir = os.path.join(cache_dir, str(horizon))
+        os.makedirs(out_dir, exist_ok=True)
+        out_path = os.path.join(out_dir, f"walk_forward_{datetime.now().strftime('%Y-%m-%d')}.csv")
+        results.to_csv(out_path, index=False)
+        print(f"[SAVED] Walk-forward metrics: {out_path}")
+    return results
@@ -1,119 +1,383 @@
 # xboost_tree_eval.py
 import argparse
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+import numpy as np
 import pandas as pd
 import xgboost as xgb
-import joblib
-from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.metrics import r2_score
 from datetime import datetime, timedelta
 from data.feature_engineering import create_dataframe
+from data.compact import restore_dates
+from strategies.model_registry import get_registry, data_hash
+from strategies.tree_compiler import load_compiled
 
-def train_models(df, n_trees=100, horizon=1, use_gpu=False):
-    os.makedirs("models", exist_ok=True)
-    r2_scores = []
+def _symbol_groups(df):
+    """
+    (symbol, frame) pairs from a feature DataFrame, or pass through an iterator of such pairs
+    (e.g. db.iter_symbol_groups streaming one symbol at a time from the database).
+    """
+    if isinstance(df, pd.DataFrame):
+        # observed=True: a categorical Symbol (compact mode) only yields symbols present in df
+        return df.groupby("Symbol", observed=True)
+    return df
 
-    for symbol, group in df.groupby("Symbol"):
-        group = group.sort_values(by="Date").copy()
-        group['Target'] = group['Close'].pct_change(periods=horizon).shift(-horizon)
-        group.dropna(inplace=True)
 
-        feature_cols = [col for col in group.columns if col not in ['Date', 'Symbol', 'Close', 'target']]
-        X = group[feature_cols]
-        y = group['Target']
+def _prepare_horizons(group, horizons):
+    """
+    Sort one symbol's rows by date once and build the forward-return target of every horizon.
+    Returns {horizon: (dates, X, y)}: all horizons slice the same feature frame, and each keeps
+    the rows where its target and every feature are defined (the old per-horizon dropna()).
+    """
+    group = group.sort_values(by="Date")
+    feature_cols = [col for col in group.columns if col not in ['Date', 'Symbol', 'Close', 'Target']]
+    X_all = group[feature_cols]
+    valid = group.drop(columns=['Target'], errors='ignore').notna().all(axis=1).to_numpy()
 
-        if len(group) < 100:
-            print(f"[SKIP] {symbol}: Not enough data")
-            continue
+    out = {}
+    for h in horizons:
+        target = group['Close'].pct_change(periods=h).shift(-h)
+        keep = valid & target.notna().to_numpy()
+        rows = np.flatnonzero(keep)
+        # Usually a prefix (only the last h rows lack a target), so slice instead of copying
+        take = slice(0, len(rows)) if len(rows) == 0 or rows[-1] == len(rows) - 1 else rows
+        out[h] = (group['Date'].iloc[take], X_all.iloc[take], target.iloc[take].rename('Target'))
+    return out
 
-        try:
-            split_idx = int(len(group) * 0.8)
-            X_train = X.iloc[:split_idx]
-            y_train = y.iloc[:split_idx]
-            X_test = X.iloc[split_idx:]
-            y_test = y.iloc[split_idx:]
 
+def _prepare_symbol(group, horizon):
+    """
+    Sort one symbol's rows by date, add the forward-return Target and split off the features.
+    Returns (dates, X, y).
+    """
+    return _prepare_horizons(group, [horizon])[horizon]
+
+
+def _fit_prepared(symbol, dates, X, y, horizon, n_trees, use_gpu, n_threads, seed, incremental=None, params=None):
+    """
+    Train and save one symbol's model for one horizon from prepared (dates, X, y).
+    Returns a result dict; a saved model also carries its test-split evaluation under "eval".
+    incremental: None for a full fit, else {"trees": ..., "full_rebuild_days": ..., "min_rows": ...,
+        "tolerance": ...} (see train_models).
+    params: extra XGBoost parameters (the tuned configuration, see _tuned_config).
+    """
+    t0 = time.perf_counter()
+    result = {"symbol": symbol, "horizon": horizon, "status": "failed", "r2": None, "model_path": None,
+              "error": None, "mode": "full", "eval": None}
+    try:
+        if len(X) < 100:
+            result["status"] = "skipped"
+            return result
+
+        split_idx = int(len(X) * 0.8)
+        X_train = X.iloc[:split_idx]
+        y_train = y.iloc[:split_idx]
+        X_test = X.iloc[split_idx:]
+        y_test = y.iloc[split_idx:]
+
+        registry = get_registry()
+        train_dates = restore_dates(dates.iloc[:split_idx])
+        train_hash = data_hash(X_train, y_train)
+        today = datetime.now().strftime("%Y-%m-%d")
+        X_fit, y_fit, fit_trees, total_trees, base, last_full = X_train, y_train, n_trees, n_trees, None, today
+
+        params = params or {}
+        meta = registry.meta(symbol, horizon) if incremental else None
+        # A model fitted with other parameters is always rebuilt
+        if (meta is not None and os.path.exists(registry.model_path(symbol, horizon))
+                and (meta.get("params") or {}) == params):
+            if meta.get("data_hash") == train_hash:
+                # Same training rows as the saved model: nothing to do
+                result["status"] = "unchanged"
+                return result
+            since_full = (pd.Timestamp(today) - pd.Timestamp(meta.get("last_full_rebuild") or meta["saved"][:10])).days
+            seen = (train_dates <= pd.Timestamp(meta["train_end"])).to_numpy()
+            # Continue only if the rows the model saw are exactly the ones it was trained on, and
+            # there are enough new rows for the extra trees to learn more than noise
+            if (since_full < incremental["full_rebuild_days"] and (~seen).sum() >= incremental["min_rows"]
+                    and meta.get("train_start") == str(train_dates.iloc[0].date())
+                    and data_hash(X_train[seen], y_train[seen]) == meta.get("data_hash")):
+                base = registry.load(symbol, horizon).get_booster()
+                X_fit, y_fit = X_train[~seen], y_train[~seen]
+                fit_trees = incremental["trees"]
+                total_trees = meta.get("n_trees", n_trees) + fit_trees
+                last_full = meta.get("last_full_rebuild") or today
+                result["mode"] = "incremental"
+
+        def fit(X_fit, y_fit, fit_trees, base):
             model = xgb.XGBRegressor(
                 objective='reg:squarederror',
-                n_estimators=n_trees,
-                tree_method='gpu_hist' if use_gpu else 'auto'
+                n_estimators=fit_trees,
+                tree_method='gpu_hist' if use_gpu else 'auto',
+                n_jobs=n_threads,
+                random_state=seed,
+                **params,
             )
-            model.fit(X_train, y_train)
+            model.fit(X_fit, y_fit, xgb_model=base)
+            return model
 
-            y_pred = model.predict(X_test)
-            r2 = r2_score(y_test, y_pred)
-            r2_scores.append(r2)
+        model = fit(X_fit, y_fit, fit_trees, base)
+        y_pred = model.predict(X_test)
+        result["r2"] = r2_score(y_test, y_pred)
 
-            os.makedirs(f"models/{horizon}", exist_ok=True)
-            model_path = f"models/{horizon}/model_{symbol}.joblib"
-            joblib.dump(model, model_path)
+        full_r2 = result["r2"]
+        if result["mode"] == "incremental":
+            # A warm start must score within tolerance of the last full rebuild, else refit fully
+            full_r2 = meta.get("full_r2", meta.get("r2"))
+            if full_r2 is not None and result["r2"] < full_r2 - incremental["tolerance"]:
+                model = fit(X_train, y_train, n_trees, None)
+                y_pred = model.predict(X_test)
+                X_fit, total_trees, last_full = X_train, n_trees, today
+                full_r2 = r2_score(y_test, y_pred)
+                result.update(r2=full_r2, mode="full", fallback=True)
 
-            print(f"[SAVED] {symbol}: Model saved to {model_path} | R^2 Score: {r2:.4f}")
-        except Exception as e:
-            print(f"[FAILED] {symbol}: {e}")
+        model_path = registry.save(
+            model, symbol, horizon, features=list(X.columns),
+            train_start=train_dates.iloc[0].date(), train_end=train_dates.iloc[-1].date(),
+            data_hash=train_hash, n_trees=total_trees, train_rows=split_idx, r2=result["r2"],
+            last_full_rebuild=last_full, last_update_rows=len(X_fit), full_r2=full_r2, params=params,
+        )
+        result.update(status="saved", model_path=model_path,
+                      eval=_eval_row(symbol, y_test.to_numpy(), y_pred, model_path))
+    except Exception as e:
+        result["error"] = str(e).strip().splitlines()[0] if str(e).strip() else repr(e)  # drop XGBoost stack traces
+    finally:
+        result["seconds"] = time.perf_counter() - t0
+    return result
 
-    if r2_scores:
-        avg_r2 = sum(r2_scores) / len(r2_scores)
-        print(f"\n[SUMMARY] Average R^2 Score across {len(r2_scores)} models: {avg_r2:.4f}")
+
+def _fit_symbol(symbol, group, n_trees, horizon, use_gpu, n_threads, seed, incremental=None, params=None):
+    """
+    Train and save one symbol's model. Runs in a worker process when train_models(n_jobs>1),
+    so it only returns a result dict and leaves the printing to the parent.
+    """
+    try:
+        dates, X, y = _prepare_symbol(group, horizon)
+    except Exception as e:
+        return {"symbol": symbol, "horizon": horizon, "status": "failed", "error": str(e), "mode": "full"}
+    return _fit_prepared(symbol, dates, X, y, horizon, n_trees, use_gpu, n_threads, seed, incremental, params)
+
+
+def _eval_row(symbol, y_test, y_pred, model_path):
+    """
+    Ranking row for one model: the latest feature row is the last test row, so its
+    prediction comes from the same batch as the test metrics.
+    """
+    return {
+        "Symbol": symbol,
+        "PredictedReturn": float(y_pred[-1]),
+        "RMSE": float(np.sqrt(np.mean((y_test - y_pred) ** 2))),
+        "ModelPath": model_path,
+        "r2": r2_score(y_test, y_pred),
+    }
+
+
+def _evaluate_prepared(symbol, X, y, horizon, registry):
+    """
+    Score the saved model of one symbol/horizon on its test split. Returns a ranking row
+    (see _eval_row), or None when there is too little data or no model.
+    """
+    if len(X) < 100:
+        return None
+    split_idx = int(len(X) * 0.8)
+    model_path = registry.resolve_path(symbol, horizon)
+    if model_path is None:
+        print(f"[MISSING] Model not found for {symbol}")
+        return None
+    booster = registry.load(symbol, horizon).get_booster()
+    # Positional arrays skip XGBoost's feature-name check: select the model's columns by name
+    features = booster.feature_names or list(X.columns)
+    missing = [f for f in features if f not in X.columns]
+    if missing:
+        raise KeyError(f"Features missing for {symbol}'s model: {', '.join(missing)}")
+    X_test = np.ascontiguousarray(X[features].iloc[split_idx:].to_numpy(dtype=np.float32))
+    return _eval_row(symbol, y.iloc[split_idx:].to_numpy(), booster.inplace_predict(X_test), model_path)
+
+
+def _report(result):
+    symbol = result["symbol"]
+    if result["status"] == "saved":
+        how = " (warm start)" if result["mode"] == "incremental" else (
+            " (full refit, warm start fell behind)" if result.get("fallback") else "")
+        print(f"[SAVED] {symbol}: Model saved to {result['model_path']}{how} | R^2 Score: {result['r2']:.4f}")
+    elif result["status"] == "skipped":
+        print(f"[SKIP] {symbol}: Not enough data")
+    elif result["status"] == "unchanged":
+        print(f"[SKIP] {symbol}: No new data since last training")
     else:
-        print("\n[SUMMARY] No models trained successfully.")
+        print(f"[FAILED] {symbol}: {result['error']}")
 
 
-def evaluate_models(df, horizon=1):
-    # Create empty DataFrame with the correct columns
-    results_df = pd.DataFrame(columns=["Symbol", "PredictedReturn", "RMSE", "ModelPath"])
-    r2_scores = []  # Store R² scores to calculate average
+class _TrainTally:
+    """
+    Running counts for the training summary.
+    """
+    def __init__(self):
+        self.r2_scores, self.skipped, self.unchanged, self.warm, self.failed = [], 0, 0, 0, {}
 
-    for symbol, group in df.groupby("Symbol"):
-        group = group.sort_values(by="Date").copy()
-        group['Target'] = group['Close'].pct_change(periods=horizon).shift(-horizon)
-        group.dropna(inplace=True)
+    def add(self, result):
+        _report(result)
+        if result["status"] == "saved":
+            self.r2_scores.append(result["r2"])
+            self.warm += result["mode"] == "incremental"
+        elif result["status"] == "skipped":
+            self.skipped += 1
+        elif result["status"] == "unchanged":
+            self.unchanged += 1
+        else:
+            self.failed[result["symbol"]] = result["error"]
 
-        feature_cols = [col for col in group.columns if col not in ['Date', 'Symbol', 'Close', 'target']]
-        X = group[feature_cols]
-        y = group['Target']
+    def summary(self, elapsed, label=""):
+        r2_scores, failed = self.r2_scores, self.failed
+        summary = {
+            "trained": len(r2_scores),
+            "warm_started": self.warm,
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+            "failed": failed,
+            "mean_r2": sum(r2_scores) / len(r2_scores) if r2_scores else None,
+            "elapsed_sec": elapsed,
+            "models_per_sec": len(r2_scores) / elapsed if elapsed > 0 else 0.0,
+        }
+        if r2_scores:
+            print(f"\n[SUMMARY]{label} Average R^2 Score across {len(r2_scores)} models: {summary['mean_r2']:.4f}")
+        elif not self.unchanged:
+            print(f"\n[SUMMARY]{label} No models trained successfully.")
+        print(f"[SUMMARY]{label} {summary['trained']} trained ({self.warm} warm-started), {self.unchanged} unchanged, "
+              f"{self.skipped} skipped, {len(failed)} failed "
+              f"in {elapsed:.1f}s ({summary['models_per_sec']:.2f} models/s)")
+        if failed:
+            print(f"[SUMMARY]{label} Failed symbols: {', '.join(sorted(failed))}")
+        return summary
 
-        if len(group) < 100:
-            continue
 
-        try:
-            split_idx = int(len(group) * 0.8)
-            X_test = X.iloc[split_idx:]
-            y_test = y.iloc[split_idx:]
+def _resolve_jobs(n_jobs, threads_per_model):
+    cores = os.cpu_count() or 1
+    n_jobs = cores if n_jobs == -1 else max(1, n_jobs)
+    if threads_per_model is None:
+        threads_per_model = max(1, cores // n_jobs) if n_jobs > 1 else None
+    return n_jobs, threads_per_model
 
-            model_path = f"models/{horizon}/model_{symbol}.joblib"
-            if not os.path.exists(model_path):
-                print(f"[MISSING] Model not found for {symbol}")
-                continue
 
-            model = joblib.load(model_path)
+def _run_symbols(df, fn, args, n_jobs, threads_per_model, collect):
+    """
+    Call fn(symbol, group, *args) for every symbol, serially or in a process pool, and pass
+    each result to collect() in this process.
+    """
+    if n_jobs == 1:
+        for symbol, group in _symbol_groups(df):
+            collect(fn(symbol, group, *args))
+        return
+    print(f"[INFO] Training with {n_jobs} processes x {threads_per_model} threads per model")
+    # spawn: forking after XGBoost/OpenMP has run in this process can deadlock the children
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=ctx) as pool:
+        pending = set()
+        for symbol, group in _symbol_groups(df):
+            # Keep only a few symbols in flight so a streamed input is never fully buffered
+            if len(pending) >= 2 * n_jobs:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    collect(f.result())
+            pending.add(pool.submit(fn, symbol, group, *args))
+        for f in as_completed(pending):
+            collect(f.result())
 
-            latest_feature = X.iloc[-1:].values
-            predicted_return = model.predict(latest_feature)[0]
-            y_pred = model.predict(X_test)
-            rmse = mean_squared_error(y_test, y_pred, squared=False)
-            r2 = r2_score(y_test, y_pred)
-            r2_scores.append(r2)
 
-            results_df.loc[len(results_df)] = {
-                "Symbol": symbol,
-                "PredictedReturn": predicted_return,
-                "RMSE": rmse,
-                "ModelPath": model_path
-            }
+def _tuned_config(horizon, n_trees, use_tuned):
+    """
+    (n_trees, params) for a horizon: the configuration saved by strategies.tuning.tune when
+    there is one and use_tuned is set, else n_trees with XGBoost's default parameters.
+    """
+    config = get_registry().best_params(horizon) if use_tuned else None
+    if config is None:
+        return n_trees, {}
+    print(f"[INFO] h={horizon}: using tuned parameters from {config.get('tuned', '?')} "
+          f"({config['n_estimators']} trees, val RMSE {config.get('val_rmse', float('nan')):.5f})")
+    return config["n_estimators"], config["params"]
 
-            print(f"[EVAL] {symbol} | RMSE: {rmse:.4f} | R²: {r2:.4f} | Prediction: {predicted_return:.4f}")
 
+def train_models(df, n_trees=100, horizon=1, use_gpu=False, n_jobs=1, threads_per_model=None, seed=42,
+                 incremental=False, incremental_trees=10, full_rebuild_days=7, incremental_min_rows=20,
+                 incremental_tolerance=0.05, use_tuned=True):
+    """
+    Train one XGBoost model per symbol and save it through the model registry
+    (models/{horizon}/model_{symbol}.ubj + .meta.json).
+
+    n_jobs: symbols trained concurrently in a process pool (1 = serial in this process,
+        -1 = one per core). threads_per_model: XGBoost threads per fit; defaults to splitting
+        the cores evenly across the pool, so n_jobs * threads_per_model ~ cores.
+    Every model is fitted with random_state=seed, so results do not depend on n_jobs.
+
+    incremental=True reuses the saved models: a symbol whose training rows are unchanged
+    (same data hash) is skipped, and one whose history only grew continues boosting with
+    incremental_trees extra trees fitted on the new rows. A warm start needs at least
+    incremental_min_rows new training rows, and its test R^2 must stay within
+    incremental_tolerance of the last full rebuild's; otherwise the model is refitted from
+    scratch. Models are also rebuilt every full_rebuild_days days, or whenever the rows they
+    were trained on changed.
+
+    use_tuned: when models/{horizon}/best_params.json exists (see strategies.tuning.tune),
+    its parameters and early-stopped tree count replace n_trees and the XGBoost defaults.
+    Returns a summary dict (trained, warm_started, unchanged, skipped, failed {symbol: error},
+    mean_r2, elapsed_sec, models_per_sec).
+    """
+    os.makedirs("models", exist_ok=True)
+    n_jobs, threads_per_model = _resolve_jobs(n_jobs, threads_per_model)
+    tally = _TrainTally()
+    t0 = time.perf_counter()
+
+    n_trees, params = _tuned_config(horizon, n_trees, use_tuned)
+    inc = {"trees": incremental_trees, "full_rebuild_days": full_rebuild_days, "min_rows": incremental_min_rows,
+           "tolerance": incremental_tolerance} if incremental else None
+    args = (n_trees, horizon, use_gpu, threads_per_model, seed, inc, params)
+    _run_symbols(df, _fit_symbol, args, n_jobs, threads_per_model, tally.add)
+    return tally.summary(time.perf_counter() - t0)
+
+
+def evaluate_models(df, horizon=1, save=True):
+    """
+    Evaluate the saved per-symbol models on df (a DataFrame or an iterator of (symbol, frame))
+    and rank their latest predictions.
+    With save=False the ranking CSV is not written, so callers evaluating the universe in
+    chunks can concatenate the results and call save_rankings() once.
+    Each model is called once: the latest feature row is the last row of the test split, so
+    the test predictions and the ranking prediction come from the same batch.
+    """
+    rows = []
+    registry = get_registry()
+
+    for symbol, group in _symbol_groups(df):
+        try:
+            _, X, y = _prepare_symbol(group, horizon)
+            row = _evaluate_prepared(symbol, X, y, horizon, registry)
+            if row is None:
+                continue
+            rows.append(row)
+            print(f"[EVAL] {symbol} | RMSE: {row['RMSE']:.4f} | R²: {row['r2']:.4f} | Prediction: {row['PredictedReturn']:.4f}")
         except Exception as e:
             print(f"[ERROR] Evaluating {symbol}: {e}")
 
-    # Save ranked CSV
-    timestamp = datetime.now().strftime("%Y-%m-%d")
-    results_df = results_df.sort_values(by="PredictedReturn", ascending=False)
-    os.makedirs(f"logs/rankings/{horizon}", exist_ok=True)
-    out_path = f"logs/rankings/{horizon}/ticker_model_predictions_{timestamp}.csv"
-    results_df.to_csv(out_path, index=False)
+    return _finish_rankings(rows, horizon, save)
 
-    print(f"[SAVED] Ranking: {out_path}")
+
+def _finish_rankings(rows, horizon, save):
+    """
+    Turn collected ranking rows into the ranking DataFrame (built once, columnar), save it
+    and print the average R².
+    """
+    r2_scores = [r["r2"] for r in rows]
+    results_df = pd.DataFrame({
+        "Symbol": [r["Symbol"] for r in rows],
+        "PredictedReturn": [r["PredictedReturn"] for r in rows],
+        "RMSE": [r["RMSE"] for r in rows],
+        "ModelPath": [r["ModelPath"] for r in rows],
+    })
+
+    if save:
+        results_df = save_rankings(results_df, horizon)
 
     # Print average R² score
     if r2_scores:
@@ -124,3 +388,150 @@ def evaluate_models(df, horizon=1):
         
     return results_df
 
+
+def _train_eval_symbol(symbol, group, horizons, configs, use_gpu, n_threads, seed, incremental, evaluate):
+    """
+    Worker for train_evaluate_horizons: prepare the symbol once, then train (and evaluate)
+    every horizon on shared slices of the same feature frame.
+    configs: {horizon: (n_trees, params)}.
+    """
+    results = []
+    try:
+        prepared = _prepare_horizons(group, horizons)
+    except Exception as e:
+        err = str(e)
+        return [({"symbol": symbol, "horizon": h, "status": "failed", "error": err, "mode": "full"}, None)
+                for h in horizons]
+    registry = get_registry()
+    for h in horizons:
+        dates, X, y = prepared[h]
+        n_trees, params = configs[h]
+        fit = _fit_prepared(symbol, dates, X, y, h, n_trees, use_gpu, n_threads, seed, incremental, params)
+        row = fit.get("eval")
+        if evaluate and row is None and fit["status"] == "unchanged":
+            try:
+                row = _evaluate_prepared(symbol, X, y, h, registry)
+            except Exception as e:
+                print(f"[ERROR] Evaluating {symbol}: {e}")
+        results.append((fit, row if evaluate else None))
+    return results
+
+
+def train_evaluate_horizons(df, horizons=(1, 7, 30), n_trees=100, use_gpu=False, n_jobs=1, threads_per_model=None,
+                            seed=42, incremental=False, incremental_trees=10, full_rebuild_days=7,
+                            incremental_min_rows=20, incremental_tolerance=0.05, evaluate=True, save=True,
+                            use_tuned=True):
+    """
+    Train and evaluate every horizon in one traversal of df.
+
+    Each symbol is sorted and split into features once; the targets of all horizons are built
+    together and every horizon trains on slices of the same feature frame. The evaluation
+    reuses the test predictions of the freshly fitted model (models left unchanged by
+    incremental mode are scored from the registry). Rankings still go to each
+    logs/rankings/{horizon}/ directory. Each horizon uses its own tuned configuration
+    (use_tuned, see train_models).
+    Returns {horizon: ranking DataFrame} (empty dict with evaluate=False).
+    """
+    os.makedirs("models", exist_ok=True)
+    horizons = list(horizons)
+    n_jobs, threads_per_model = _resolve_jobs(n_jobs, threads_per_model)
+    tallies = {h: _TrainTally() for h in horizons}
+    rows = {h: [] for h in horizons}
+    t0 = time.perf_counter()
+
+    def collect(results):
+        for fit, row in results:
+            h = fit["horizon"]
+            tallies[h].add(fit)
+            if row is not None:
+                rows[h].append(row)
+                print(f"[EVAL] {row['Symbol']} (h={h}) | RMSE: {row['RMSE']:.4f} | R²: {row['r2']:.4f} "
+                      f"| Prediction: {row['PredictedReturn']:.4f}")
+
+    inc = {"trees": incremental_trees, "full_rebuild_days": full_rebuild_days, "min_rows": incremental_min_rows,
+           "tolerance": incremental_tolerance} if incremental else None
+    configs = {h: _tuned_config(h, n_trees, use_tuned) for h in horizons}
+    args = (horizons, configs, use_gpu, threads_per_model, seed, inc, evaluate)
+    _run_symbols(df, _train_eval_symbol, args, n_jobs, threads_per_model, collect)
+
+    elapsed = time.perf_counter() - t0
+    rankings = {}
+    for h in horizons:
+        tallies[h].summary(elapsed, label=f" [h={h}]")
+        if evaluate:
+            rankings[h] = _finish_rankings(rows[h], h, save)
+    return rankings
+
+
+def save_rankings(results_df, horizon=1):
+    """
+    Sort predictions by PredictedReturn and write logs/rankings/{horizon}/ticker_model_predictions_{date}.csv
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d")
+    results_df = results_df.sort_values(by="PredictedReturn", ascending=False)
+    os.makedirs(f"logs/rankings/{horizon}", exist_ok=True)
+    out_path = f"logs/rankings/{horizon}/ticker_model_predictions_{timestamp}.csv"
+    results_df.to_csv(out_path, index=False)
+
+    print(f"[SAVED] Ranking: {out_path}")
+    return results_df
+
+
+def predict_latest(latest_df, horizon=1, compiled=False):
+    """
+    Predict from one feature row per symbol (e.g. the market_data_latest view) with the saved
+    models, without loading any history. Returns Symbol, Date, PredictedReturn, ModelPath.
+    The latest rows are packed into one contiguous float32 matrix up front; each model then
+    scores its own row in place, without building a DataFrame or DMatrix per symbol.
+    compiled=True scores every symbol exported by tree_compiler.export_compiled in a single
+    batched NumPy call; symbols without a fresh compiled model, or whose model splits on a
+    column latest_df does not have, fall back to XGBoost.
+    """
+    registry = get_registry()
+    numeric = [c for c in latest_df.columns if c not in ("Date", "Symbol")]
+    matrix = np.ascontiguousarray(latest_df[numeric].to_numpy(dtype=np.float32))
+    col_pos = {c: i for i, c in enumerate(numeric)}
+    col_index = {}  # feature tuple -> column indices into matrix
+    predicted = {}  # row -> (prediction, model path)
+
+    forest, stale = load_compiled(horizon) if compiled else (None, [])
+    if forest is not None:
+        fresh = set(forest.symbols) - set(stale)
+        present = [j for j, f in enumerate(forest.features) if f in col_pos]
+        if len(present) < len(forest.features):
+            # Models needing a column latest_df lacks go to XGBoost, which reports it per symbol
+            missing = sorted(set(range(len(forest.features))) - set(present))
+            blocked = forest.feature_usage()[:, missing].any(axis=1)
+            fresh = {s for s in fresh if not blocked[forest.index[s]]}
+        rows = [i for i, symbol in enumerate(latest_df["Symbol"]) if symbol in fresh]
+        if rows:
+            X = np.full((len(rows), len(forest.features)), np.nan, dtype=np.float32)
+            X[:, present] = matrix[np.ix_(rows, [col_pos[forest.features[j]] for j in present])]
+            preds = forest.predict(X, [forest.index[latest_df["Symbol"].iloc[i]] for i in rows])
+            path = registry.compiled_path(horizon)
+            predicted.update({i: (float(p), path) for i, p in zip(rows, preds)})
+
+    for i, symbol in enumerate(latest_df["Symbol"]):
+        if i in predicted:
+            continue
+        model_path = registry.resolve_path(symbol, horizon)
+        if model_path is None:
+            print(f"[MISSING] Model not found for {symbol}")
+            continue
+        try:
+            booster = registry.load(symbol, horizon).get_booster()
+            features = tuple(booster.feature_names)
+            if features not in col_index:
+                col_index[features] = [col_pos[f] for f in features]
+            row = matrix[i:i + 1, col_index[features]]
+            predicted[i] = (float(booster.inplace_predict(row)[0]), model_path)
+        except Exception as e:
+            print(f"[ERROR] Predicting {symbol}: {e}")
+
+    rows = sorted(predicted)
+    return pd.DataFrame({
+        "Symbol": latest_df["Symbol"].to_numpy()[rows],
+        "Date": latest_df["Date"].to_numpy()[rows],
+        "PredictedReturn": [predicted[i][0] for i in rows],
+        "ModelPath": [predicted[i][1] for i in rows],
+    })
@@ -1,15 +1,25 @@
+from db import get_engine
+
+
 def insert_predictions_to_db(conn, df, horizon, strategy):
-    cur = conn.cursor()
-    for _, row in df.iterrows():
-        cur.execute("""
+    """
+    Insert ranked predictions into model_predictions in one batch.
+    conn=None borrows a connection from the shared pool (db.get_engine()).
+    """
+    own = conn is None
+    if own:
+        conn = get_engine().raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.executemany("""
             INSERT INTO model_predictions (ticker, prediction_date, model_output, horizon, strategy)
             VALUES (%s, %s, %s, %s, %s)
-        """, (
-            row['Symbol'],
-            row['Date'],
-            row['Predicted Return'],
-            horizon,
-            strategy
-        ))
-    conn.commit()
-    cur.close()
+        """, [
+            (row['Symbol'], row['Date'], row['Predicted Return'], horizon, strategy)
+            for _, row in df.iterrows()
+        ])
+        conn.commit()
+        cur.close()
+    finally:
+        if own:
+            conn.close()